@@ -14,3 +14,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LittleLemon.settings")
 
 application = get_asgi_application()
+
+# Warm up before accepting traffic, see LittleLemonAPI.warmup.
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, "WARM_UP", True):
+    from LittleLemonAPI.warmup import warm_up
+
+    warm_up()
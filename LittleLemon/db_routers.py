@@ -0,0 +1,62 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Apps whose reads may be served by replicas. Sessions, tokens, and users are
+# always read from the primary, so logins and role changes apply immediately.
+REPLICA_APPS = {"LittleLemonAPI"}
+
+_read_from_replicas = ContextVar("read_from_replicas", default=False)
+
+
+def get_replicas():
+    """Return the aliases of the read replica databases."""
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+@contextmanager
+def read_from_replicas():
+    """Context manager routing reads of REPLICA_APPS models to the replicas."""
+    token = _read_from_replicas.set(True)
+    try:
+        yield
+    finally:
+        _read_from_replicas.reset(token)
+
+
+def reading_from_replicas():
+    """Checks if reads in the current context are routed to the replicas."""
+    return _read_from_replicas.get()
+
+
+class ReplicaRouter:
+    """
+    Route reads in read_from_replicas() contexts to a random replica.
+
+    All writes, and all other reads, go to the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if (
+            replicas
+            and _read_from_replicas.get()
+            and model._meta.app_label in REPLICA_APPS
+        ):
+            return random.choice(replicas)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, never migrated on their own.
+        if db in get_replicas():
+            return False
+        return None
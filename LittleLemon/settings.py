@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Project middleware, first so it measures the whole request.
+    "LittleLemonAPI.middleware.PerformanceMiddleware",
+    "LittleLemonAPI.middleware.CompressionMiddleware",
+    "LittleLemonAPI.querydetector.QueryDetectorMiddleware",
+    "LittleLemonAPI.middleware.ReplicaMiddleware",
+    # Default Django middleware
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -55,6 +62,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Profiling middleware, after authentication to only profile for managers.
+    "LittleLemonAPI.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "LittleLemon.urls"
@@ -85,6 +94,36 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Test on a file, as in-memory SQLite doesn't wait on concurrent writes.
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+    },
+    # Local SQLite replica, only read from when listed in DATABASE_REPLICAS. Copy
+    # the primary to it with the copyreplicas command.
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db_replica.sqlite3",
+        "TEST": {"NAME": BASE_DIR / "test_db_replica.sqlite3"},
+    },
+}
+
+# Aliases of read replicas in DATABASES, which GET requests read from. Replicas
+# of other databases should set "TEST": {"MIRROR": "default"}. To try replicas
+# locally, add "replica" and run the copyreplicas command.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ["LittleLemon.db_routers.ReplicaRouter"]
+# Seconds a client reads from the primary after a write, to read its own writes.
+# Tracked in a cookie, and in the default cache for clients without cookies.
+READ_YOUR_WRITES_SECONDS = 5
+
+
+# Cache shared by all processes on the host, such as web workers and management
+# commands, which count cache entries, throttling history and persistent metrics
+# counters in LittleLemonAPI.metrics. Use Redis or Memcached across hosts.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
     }
 }
 
@@ -138,6 +177,12 @@ REST_FRAMEWORK = {
         "rest_framework.renderers.BrowsableAPIRenderer",
         "rest_framework_xml.renderers.XMLRenderer",
     ],
+    # Parsing
+    "DEFAULT_PARSER_CLASSES": [
+        "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     # Authentication
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication",
@@ -149,7 +194,7 @@ REST_FRAMEWORK = {
         "rest_framework.filters.OrderingFilter",
         "rest_framework.filters.SearchFilter",
     ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "LittleLemonAPI.pagination.CachedCountPagination",
     "PAGE_SIZE": 2,
     # Throttling
     "DEFAULT_THROTTLE_CLASSES": [
@@ -162,7 +207,94 @@ REST_FRAMEWORK = {
     },
 }
 
+# Binary formats, negotiated when their optional packages are installed.
+if find_spec("msgpack"):
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].append(
+        "LittleLemonAPI.renderers.MessagePackRenderer"
+    )
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"].append(
+        "LittleLemonAPI.renderers.MessagePackParser"
+    )
+if find_spec("cbor2"):
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].append(
+        "LittleLemonAPI.renderers.CBORRenderer"
+    )
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"].append(
+        "LittleLemonAPI.renderers.CBORParser"
+    )
+
 # Djoser settings
 DJOSER = {
     "USER_ID_FIELD": "username",
 }
+
+# Query detector settings, see LittleLemonAPI.querydetector.
+QUERY_DETECTOR = {
+    # Enable to log repeated and slow queries of every request.
+    "ENABLED": False,
+    "SLOW_QUERY_MS": 100,
+    "REPEATED_QUERY_THRESHOLD": 5,
+    # Enable to raise instead of logging, to fail tests in CI.
+    "RAISE": False,
+}
+
+# Delivered orders older than this many days are moved to the archive tables by
+# the archiveorders command, see LittleLemonAPI.archive.
+ORDER_ARCHIVE_AFTER_DAYS = 90
+
+# Seconds order events are held back before delivery to webhook subscribers, so
+# events of transactions committing out of id order are not skipped. Must exceed
+# the duration of the longest transaction writing orders, see
+# LittleLemonAPI.webhooks.
+WEBHOOK_SETTLE_SECONDS = 5
+
+# Cart lines not updated within this many days expire, and are deleted by the
+# expirecarts command, see LittleLemonAPI.carts.
+CART_TTL_DAYS = 7
+
+# Directory the menu snapshot served by /api/menu is published to, see
+# LittleLemonAPI.snapshots.
+MENU_SNAPSHOT_DIR = BASE_DIR / "menu_snapshots"
+
+# Response compression settings, see LittleLemonAPI.middleware.
+COMPRESSION = {
+    "MIN_SIZE": 1024,
+    "GZIP_LEVEL": 6,
+    # Brotli is used when the optional brotli package is installed.
+    "BROTLI_QUALITY": 4,
+    "CACHE_SIZE": 128,
+}
+
+# Request profiling settings, see LittleLemonAPI.profiling.
+PROFILING = {
+    # Enable to profile requests of managers sending an X-Profile header or a
+    # ?profile query parameter.
+    "ENABLED": False,
+    # Fraction of all requests profiled when enabled.
+    "SAMPLE_RATE": 0.0,
+    # Profiles are kept in the cache, shared by all workers when the cache is.
+    "MAX_PROFILES": 50,
+    "TIMEOUT": 3600,
+    "STATS_LIMIT": 40,
+}
+
+# Kitchen preparation queue settings, see LittleLemonAPI.kitchen.
+KITCHEN = {
+    "QUEUE_SIZE": 500,
+    # Seconds before the in-memory queue picks up tasks of other processes.
+    "REFRESH_SECONDS": 2,
+    # Seconds before tasks claimed but not completed are queued again.
+    "CLAIM_TIMEOUT_SECONDS": 1800,
+}
+
+# Warm up URL resolvers, DRF settings and serializers when the WSGI or ASGI
+# application is loaded, before workers accept traffic, see LittleLemonAPI.warmup.
+WARM_UP = True
+
+# Pagination settings, see LittleLemonAPI.pagination.
+PAGINATION = {
+    # Seconds counts of list endpoints are cached, unless invalidated by writes.
+    "COUNT_CACHE_TTL": 60,
+    # Lists longer than this are paginated without a count.
+    "APPROXIMATE_COUNT_THRESHOLD": 10000,
+}
@@ -0,0 +1,74 @@
+"""
+Lean Django settings for JSON API workers in production.
+
+Leaves out the admin, the browsable API and XML content negotiation, so workers
+import and initialize less on startup. Use with
+DJANGO_SETTINGS_MODULE=LittleLemon.settings_lean and a comma separated list of
+the served host names in DJANGO_ALLOWED_HOSTS, and measure the difference with
+the importprofile command.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401, F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK, TEMPLATES
+
+DEBUG = False
+
+# Required, as no host is allowed by default without DEBUG.
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",")
+    if host.strip()
+]
+if not ALLOWED_HOSTS:
+    raise ImproperlyConfigured(
+        "Set DJANGO_ALLOWED_HOSTS to a comma separated list of the served hosts."
+    )
+
+INSTALLED_APPS = [
+    app
+    for app in INSTALLED_APPS
+    if app
+    not in (
+        "django.contrib.admin",
+        "django.contrib.messages",
+        "django.contrib.staticfiles",
+    )
+]
+
+MIDDLEWARE = [
+    middleware
+    for middleware in MIDDLEWARE
+    if middleware != "django.contrib.messages.middleware.MessageMiddleware"
+]
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        "OPTIONS": {
+            "context_processors": [
+                processor
+                for processor in TEMPLATES[0]["OPTIONS"]["context_processors"]
+                if processor != "django.contrib.messages.context_processors.messages"
+            ],
+        },
+    }
+]
+
+# JSON and the optional binary formats only, without the browsable API and its
+# templates, or the XML renderer. The menu snapshot is still published as XML.
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": [
+        renderer
+        for renderer in REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"]
+        if renderer
+        not in (
+            "rest_framework.renderers.BrowsableAPIRenderer",
+            "rest_framework_xml.renderers.XMLRenderer",
+        )
+    ],
+}
@@ -13,12 +13,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path("api/", include("LittleLemonAPI.urls")),
     path("auth/", include("djoser.urls")),
     path("auth/", include("djoser.urls.authtoken")),
 ]
+
+# The admin is left out of lean deployments, see LittleLemon.settings_lean.
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path("admin/", admin.site.urls))
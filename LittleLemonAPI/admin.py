@@ -1,5 +1,144 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import (
+    Category,
+    MenuItem,
+    MenuItemPrice,
+    Cart,
+    Order,
+    OrderItem,
+    ArchivedOrder,
+    ArchivedOrderItem,
+    PrepTask,
+    Job,
+    OrderEvent,
+    WebhookSubscriber,
+)
 
-admin.site.register([Category, MenuItem, Cart, Order, OrderItem])
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator estimating the row count of unfiltered changelists of huge tables.
+
+    Uses the planner statistics on PostgreSQL, and counts exactly when filtered,
+    below ESTIMATE_THRESHOLD rows, or on other databases. Those have no cheap
+    estimate that stays accurate after large deletes, such as archiving orders.
+    """
+
+    ESTIMATE_THRESHOLD = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.where and connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            estimate = int(row[0]) if row else 0
+            if estimate > self.ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Admin for tables too large to count on every changelist page."""
+
+    paginator = EstimatedCountPaginator
+    # Skip the unfiltered count shown next to filtered result counts.
+    show_full_result_count = False
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ["id", "title", "slug"]
+    search_fields = ["title"]
+    prepopulated_fields = {"slug": ["title"]}
+
+
+@admin.register(MenuItem)
+class MenuItemAdmin(admin.ModelAdmin):
+    list_display = ["id", "title", "price", "featured", "category"]
+    list_select_related = ["category"]
+    list_filter = ["featured", "category"]
+    search_fields = ["title"]
+    raw_id_fields = ["price_version"]
+
+
+@admin.register(MenuItemPrice)
+class MenuItemPriceAdmin(LargeTableAdmin):
+    list_display = ["id", "menuitem", "price", "created"]
+    list_select_related = ["menuitem__category"]
+    raw_id_fields = ["menuitem"]
+
+
+@admin.register(Cart)
+class CartAdmin(LargeTableAdmin):
+    list_display = ["id", "user", "menuitem", "quantity", "unit_price", "updated"]
+    list_select_related = ["user", "menuitem__category"]
+    raw_id_fields = ["user", "price_version"]
+    autocomplete_fields = ["menuitem"]
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ["id", "user", "delivery_crew", "status", "total", "date"]
+    list_select_related = ["user", "delivery_crew"]
+    list_filter = ["status"]
+    date_hierarchy = "date"
+    raw_id_fields = ["user", "delivery_crew"]
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ["id", "order", "menuitem", "quantity", "unit_price", "price"]
+    list_select_related = ["order__user", "menuitem__category"]
+    raw_id_fields = ["order"]
+    autocomplete_fields = ["menuitem"]
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    list_display = ["id", "user", "delivery_crew", "total", "date"]
+    list_select_related = ["user", "delivery_crew"]
+    date_hierarchy = "date"
+    raw_id_fields = ["user", "delivery_crew"]
+
+
+@admin.register(ArchivedOrderItem)
+class ArchivedOrderItemAdmin(LargeTableAdmin):
+    list_display = ["id", "order", "menuitem", "quantity", "unit_price", "price"]
+    list_select_related = ["menuitem__category"]
+    raw_id_fields = ["order"]
+    autocomplete_fields = ["menuitem"]
+
+
+@admin.register(PrepTask)
+class PrepTaskAdmin(LargeTableAdmin):
+    list_display = ["id", "order", "menuitem", "quantity", "status", "start_by"]
+    list_select_related = ["order__user", "menuitem__category"]
+    list_filter = ["status", "station"]
+    raw_id_fields = ["order", "order_item", "menuitem"]
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ["id", "name", "status", "attempts", "run_after", "created"]
+    list_filter = ["status", "name"]
+
+
+@admin.register(OrderEvent)
+class OrderEventAdmin(LargeTableAdmin):
+    list_display = ["id", "event", "order_id", "created"]
+    list_filter = ["event"]
+
+
+@admin.register(WebhookSubscriber)
+class WebhookSubscriberAdmin(admin.ModelAdmin):
+    list_display = ["id", "url", "active", "last_event_id", "failures", "retry_after"]
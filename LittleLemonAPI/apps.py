@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class LittlelemonapiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "LittleLemonAPI"
+
+    def ready(self):
+        # Register background job handlers.
+        from . import tasks  # noqa: F401
+
+        # Publish menu snapshots when the menu changes.
+        from . import snapshots  # noqa: F401
+
+        # Invalidate cached list counts on writes.
+        from . import pagination  # noqa: F401
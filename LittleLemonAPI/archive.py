@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import pagination
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, PrepTask
+
+ORDER_FIELDS = ["id", "user_id", "delivery_crew_id", "status", "total", "date"]
+ORDER_ITEM_FIELDS = ["id", "order_id", "menuitem_id", "quantity", "unit_price", "price"]
+
+
+def get_horizon():
+    """Return the date before which delivered orders are archived."""
+    days = getattr(settings, "ORDER_ARCHIVE_AFTER_DAYS", 90)
+    return timezone.localdate() - timedelta(days=days)
+
+
+def delete_rows(model, field: str, values):
+    """
+    Delete rows of model whose field is in values, with one DELETE statement.
+
+    Unlike QuerySet.delete(), related objects are not collected and no signals
+    are sent, so related rows must be deleted first, and counts invalidated.
+    """
+    quote_name = connection.ops.quote_name
+    placeholders = ", ".join(["%s"] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote_name(model._meta.db_table)} "
+            f"WHERE {quote_name(model._meta.get_field(field).column)} "
+            f"IN ({placeholders})",
+            values,
+        )
+
+
+@transaction.atomic
+def archive_batch(before, batch_size: int):
+    """
+    Move one batch of delivered orders dated before a date to the archive.
+
+    Returns the number of orders archived.
+    """
+    order_ids = list(
+        Order.objects.filter(status=True, date__lt=before)
+        .order_by("pk")
+        .values_list("pk", flat=True)[:batch_size]
+    )
+    if not order_ids:
+        return 0
+
+    ArchivedOrder.objects.bulk_create(
+        ArchivedOrder(**values)
+        for values in Order.objects.filter(pk__in=order_ids).values(*ORDER_FIELDS)
+    )
+    order_items = OrderItem.objects.filter(order_id__in=order_ids)
+    ArchivedOrderItem.objects.bulk_create(
+        ArchivedOrderItem(**values) for values in order_items.values(*ORDER_ITEM_FIELDS)
+    )
+    # Delete without collecting related objects, as prep tasks and order items
+    # go first.
+    delete_rows(PrepTask, "order", order_ids)
+    delete_rows(OrderItem, "order", order_ids)
+    delete_rows(Order, "id", order_ids)
+    pagination.invalidate_counts(
+        Order, OrderItem, PrepTask, ArchivedOrder, ArchivedOrderItem
+    )
+    return len(order_ids)
+
+
+def archive_orders(before=None, batch_size: int = 1000):
+    """
+    Move delivered orders dated before a date, by default the horizon, to the
+    archive in batches of one transaction each.
+
+    Returns the number of orders archived.
+    """
+    before = before or get_horizon()
+    archived_count = 0
+    while batch_count := archive_batch(before, batch_size):
+        archived_count += batch_count
+    return archived_count
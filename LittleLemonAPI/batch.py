@@ -0,0 +1,134 @@
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from contextvars import copy_context
+from urllib.parse import urlencode, urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.http import Http404
+from django.urls import Resolver404, resolve
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Request headers not passed on to sub-requests.
+EXCLUDED_META = ("CONTENT_TYPE", "CONTENT_LENGTH", "HTTP_ACCEPT_ENCODING")
+
+
+def encode_body(body):
+    """
+    Encode the body of a sub-request.
+
+    Flat dicts are form encoded, as some views only read form data, and other
+    bodies are JSON encoded.
+    """
+    if body is None:
+        return b"", ""
+    if isinstance(body, dict) and not any(
+        isinstance(value, (dict, list)) for value in body.values()
+    ):
+        return urlencode(body).encode(), "application/x-www-form-urlencoded"
+    return json.dumps(body).encode(), "application/json"
+
+
+def build_request(request, method: str, path: str, body=None):
+    """
+    Return a sub-request of a request, with its headers and authenticated user.
+
+    Raises Http404 for paths outside of LittleLemonAPI.urls.
+    """
+    url = urlsplit(path)
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        raise Http404(f"No route matches {url.path}")
+    if match.app_name != "LittleLemonAPI" or match.route == "api/batch":
+        raise Http404(f"{url.path} can't be batched")
+
+    content, content_type = encode_body(body)
+    environ = {
+        key: value for key, value in request.META.items() if key not in EXCLUDED_META
+    }
+    environ.update(
+        {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "CONTENT_TYPE": content_type,
+            "CONTENT_LENGTH": str(len(content)),
+            "HTTP_ACCEPT": "application/json",
+            "wsgi.input": io.BytesIO(content),
+        }
+    )
+    sub_request = WSGIRequest(environ)
+    sub_request.resolver_match = match
+    sub_request.user = request.user
+    if request.user.is_authenticated:
+        # Reuse the authentication of the batch request, see rest_framework.request.
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def get_response(sub_request):
+    """Run the view of a sub-request, and return its status and decoded body."""
+    match = sub_request.resolver_match
+    response = match.func(sub_request, *match.args, **match.kwargs)
+    if hasattr(response, "render"):
+        response.render()
+    if response.streaming:
+        content = b"".join(response.streaming_content)
+    else:
+        content = response.content
+    if response.get("Content-Type", "").startswith("application/json"):
+        body = json.loads(content) if content else None
+    else:
+        body = content.decode()
+    return {"status": response.status_code, "body": body}
+
+
+def get_safe_response(sub_request):
+    """
+    Return the response of a sub-request, or a 500 response if its view fails.
+
+    Each sub-request is run in its own transaction, or savepoint, so the writes
+    of a failed sub-request are rolled back and don't affect the others.
+    """
+    try:
+        with transaction.atomic():
+            return get_response(sub_request)
+    except Exception:
+        logger.exception("Batched request to %s failed", sub_request.path)
+        return {"status": 500, "body": {"detail": "Internal server error"}}
+
+
+def get_concurrent_response(sub_request):
+    try:
+        with ExitStack() as stack:
+            # Threads open their own database connections, so record their
+            # queries in the timings of the batch request too.
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics.record_query))
+            return get_safe_response(sub_request)
+    finally:
+        connections.close_all()
+
+
+def run(sub_requests, concurrency: int = 0):
+    """
+    Run sub-requests in order, or from concurrent threads if concurrency is set.
+
+    Only run read-only sub-requests concurrently, as they may be run in any order.
+    """
+    if not concurrency:
+        return [get_safe_response(sub_request) for sub_request in sub_requests]
+    with ThreadPoolExecutor(concurrency) as executor:
+        futures = [
+            executor.submit(copy_context().run, get_concurrent_response, sub_request)
+            for sub_request in sub_requests
+        ]
+        return [future.result() for future in futures]
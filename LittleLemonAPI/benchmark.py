@@ -0,0 +1,661 @@
+import itertools
+import json
+import math
+import statistics
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import date
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import kitchen, profiling, urls
+from .middleware import brotli, compress
+from .models import Category, MenuItem, Cart, Order, OrderItem, PrepTask
+from .seeding import SEED_USERNAME_PREFIX
+
+BENCHMARK_USERNAME_PREFIX = "benchmark-"
+
+# Run id and counter used to give objects created by write scenarios unique names.
+_run_id = format(time.time_ns(), "x")
+_counter = itertools.count()
+
+
+class Scenario:
+    """
+    A single request against an API endpoint.
+
+    The optional setup callable is run before each request, outside of the timed
+    section, and returns values used to format the path and data.
+    """
+
+    def __init__(self, name, method, path, role, data=None, setup=None, json=False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.role = role
+        self.data = data or {}
+        self.setup = setup
+        self.json = json
+
+    @property
+    def is_read(self):
+        return self.method == "GET"
+
+    def build(self, fixtures):
+        """Return the path, and encoded body and content type for the request."""
+        values = dict(fixtures)
+        if self.setup:
+            values.update(self.setup(fixtures))
+        path = "/api/" + self.path.format(**values)
+        data = format_data(self.data, values)
+        # Client.generic expects an already encoded body.
+        if self.json:
+            return path, json.dumps(data), "application/json"
+        return path, urlencode(data), "application/x-www-form-urlencoded"
+
+
+def format_data(data, values):
+    """Format all strings in nested request data with values."""
+    if isinstance(data, dict):
+        return {key: format_data(value, values) for key, value in data.items()}
+    if isinstance(data, list):
+        return [format_data(value, values) for value in data]
+    return str(data).format(**values)
+
+
+def _unique(fixtures):
+    return {"n": f"{_run_id}-{next(_counter)}"}
+
+
+def _new_menuitem(fixtures):
+    n = _unique(fixtures)["n"]
+    menuitem = MenuItem.objects.create(
+        title=f"Benchmark item {n}",
+        price="1.00",
+        featured=False,
+        category_id=fixtures["category"],
+    )
+    return {"n": n, "menuitem": menuitem.pk}
+
+
+def _empty_cart(fixtures):
+    Cart.objects.filter(user_id=fixtures["customer"]).delete()
+    return {}
+
+
+def _fill_cart(fixtures):
+    _empty_cart(fixtures)
+    menuitem = MenuItem.objects.get(pk=fixtures["menuitem"])
+    Cart.objects.create(
+        user_id=fixtures["customer"],
+        menuitem=menuitem,
+        quantity=1,
+        unit_price=menuitem.price,
+        price_version_id=menuitem.price_version_id,
+    )
+    return {}
+
+
+def _new_order(fixtures):
+    order = Order.objects.create(user_id=fixtures["customer"], total="1.00")
+    return {"order": order.pk}
+
+
+def _new_prep_task(fixtures):
+    order = Order.objects.create(user_id=fixtures["customer"], total="1.00")
+    OrderItem.objects.create(
+        order=order,
+        menuitem_id=fixtures["menuitem"],
+        quantity=1,
+        unit_price="1.00",
+        price="1.00",
+    )
+    (task,) = kitchen.create_tasks({order.pk: timezone.now()})
+    return {"prep_task": task.pk}
+
+
+def _claimed_prep_task(fixtures):
+    values = _new_prep_task(fixtures)
+    PrepTask.objects.filter(pk=values["prep_task"]).update(
+        status=PrepTask.CLAIMED, station="benchmark", claimed=timezone.now()
+    )
+    return values
+
+
+def _new_profile(fixtures):
+    with profiling.profile("GET", "/benchmark") as profile:
+        MenuItem.objects.filter(pk=fixtures["menuitem"]).exists()
+    return {"profile": profile.id}
+
+
+def get_scenarios():
+    """Return scenarios covering every route in LittleLemonAPI.urls."""
+    return [
+        # Menu-items endpoints.
+        Scenario("categories GET", "GET", "categories", "anonymous"),
+        Scenario(
+            "categories POST",
+            "POST",
+            "categories",
+            "manager",
+            {"slug": "benchmark-{n}", "title": "Benchmark category {n}"},
+            setup=_unique,
+        ),
+        Scenario("menu-items GET", "GET", "menu-items", "anonymous"),
+        Scenario(
+            "menu-items GET featured", "GET", "menu-items?featured=True", "anonymous"
+        ),
+        Scenario(
+            "menu-items POST",
+            "POST",
+            "menu-items",
+            "manager",
+            {
+                "title": "Benchmark item {n}",
+                "price": "1.00",
+                "featured": "false",
+                "category_id": "{category}",
+            },
+            setup=_unique,
+        ),
+        Scenario("menu-items/<pk> GET", "GET", "menu-items/{menuitem}", "anonymous"),
+        Scenario(
+            "menu-items/<pk> PUT",
+            "PUT",
+            "menu-items/{menuitem}",
+            "manager",
+            {
+                "title": "Benchmark item {n}",
+                "price": "2.00",
+                "featured": "false",
+                "category_id": "{category}",
+            },
+            setup=_new_menuitem,
+            json=True,
+        ),
+        Scenario(
+            "menu-items/<pk> PATCH",
+            "PATCH",
+            "menu-items/{menuitem}",
+            "manager",
+            {"price": "3.00"},
+            setup=_new_menuitem,
+            json=True,
+        ),
+        Scenario(
+            "menu-items/<pk> DELETE",
+            "DELETE",
+            "menu-items/{menuitem}",
+            "manager",
+            setup=_new_menuitem,
+        ),
+        Scenario("menu GET", "GET", "menu", "anonymous"),
+        # User role management endpoints.
+        Scenario("groups/manager/users GET", "GET", "groups/manager/users", "manager"),
+        Scenario(
+            "groups/manager/users POST",
+            "POST",
+            "groups/manager/users",
+            "manager",
+            {"username": "{target_username}"},
+        ),
+        Scenario(
+            "groups/manager/users/<pk> DELETE",
+            "DELETE",
+            "groups/manager/users/{target}",
+            "manager",
+        ),
+        Scenario(
+            "groups/manager/users/batch POST",
+            "POST",
+            "groups/manager/users/batch",
+            "manager",
+            {"usernames": ["{target_username}"]},
+            json=True,
+        ),
+        Scenario(
+            "groups/manager/users/batch DELETE",
+            "DELETE",
+            "groups/manager/users/batch",
+            "manager",
+            {"ids": ["{target}"]},
+            json=True,
+        ),
+        Scenario(
+            "groups/delivery-crew/users GET",
+            "GET",
+            "groups/delivery-crew/users",
+            "manager",
+        ),
+        Scenario(
+            "groups/delivery-crew/users POST",
+            "POST",
+            "groups/delivery-crew/users",
+            "manager",
+            {"username": "{target_username}"},
+        ),
+        Scenario(
+            "groups/delivery-crew/users/<pk> DELETE",
+            "DELETE",
+            "groups/delivery-crew/users/{target}",
+            "manager",
+        ),
+        Scenario(
+            "groups/delivery-crew/users/batch POST",
+            "POST",
+            "groups/delivery-crew/users/batch",
+            "manager",
+            {"usernames": ["{target_username}"]},
+            json=True,
+        ),
+        Scenario(
+            "groups/delivery-crew/users/batch DELETE",
+            "DELETE",
+            "groups/delivery-crew/users/batch",
+            "manager",
+            {"ids": ["{target}"]},
+            json=True,
+        ),
+        # Cart and Order management endpoints.
+        Scenario("cart/menu-items GET", "GET", "cart/menu-items", "customer"),
+        Scenario(
+            "cart/menu-items POST",
+            "POST",
+            "cart/menu-items",
+            "customer",
+            {"menuitem": "{menuitem_title}", "quantity": "1"},
+            setup=_empty_cart,
+        ),
+        Scenario(
+            "cart/menu-items DELETE",
+            "DELETE",
+            "cart/menu-items",
+            "customer",
+            setup=_fill_cart,
+        ),
+        Scenario("cart/orders GET", "GET", "cart/orders", "customer"),
+        Scenario("orders GET manager", "GET", "orders", "manager"),
+        Scenario("orders GET delivery crew", "GET", "orders", "delivery_crew"),
+        Scenario("orders GET customer", "GET", "orders", "customer"),
+        Scenario("orders GET archived", "GET", "orders?archived=true", "manager"),
+        Scenario("orders POST", "POST", "orders", "customer", setup=_fill_cart),
+        Scenario("cart/orders/<pk> GET", "GET", "cart/orders/{order}", "manager"),
+        Scenario("orders/<pk> GET", "GET", "orders/{order}", "manager"),
+        Scenario(
+            "orders/<pk> PUT",
+            "PUT",
+            "orders/{order}",
+            "manager",
+            {
+                "user": "{customer}",
+                "delivery_crew": "{delivery_crew}",
+                "status": "False",
+                "total": "1.00",
+                "date": date.today().isoformat(),
+            },
+            setup=_new_order,
+        ),
+        Scenario(
+            "orders/<pk> PATCH",
+            "PATCH",
+            "orders/{order}",
+            "manager",
+            {"status": "False"},
+            setup=_new_order,
+        ),
+        Scenario(
+            "orders/<pk> DELETE",
+            "DELETE",
+            "orders/{order}",
+            "manager",
+            setup=_new_order,
+        ),
+        Scenario(
+            "orders/batch POST",
+            "POST",
+            "orders/batch",
+            "manager",
+            {
+                "updates": [
+                    {
+                        "order_id": "{order}",
+                        "status": "false",
+                        "delivery_crew": "{delivery_crew}",
+                    }
+                ]
+            },
+            setup=_new_order,
+            json=True,
+        ),
+        # Kitchen preparation queue endpoints.
+        Scenario("kitchen/tasks GET", "GET", "kitchen/tasks", "manager"),
+        Scenario(
+            "kitchen/tasks/claim POST",
+            "POST",
+            "kitchen/tasks/claim",
+            "manager",
+            {"station": "benchmark"},
+            setup=_new_prep_task,
+        ),
+        Scenario(
+            "kitchen/tasks/<pk>/complete POST",
+            "POST",
+            "kitchen/tasks/{prep_task}/complete",
+            "manager",
+            {"station": "benchmark"},
+            setup=_claimed_prep_task,
+        ),
+        # Batch request endpoint.
+        Scenario(
+            "batch POST",
+            "POST",
+            "batch",
+            "customer",
+            {
+                "requests": [
+                    {"method": "GET", "path": "/api/categories"},
+                    {"method": "GET", "path": "/api/menu-items?featured=True"},
+                    {"method": "GET", "path": "/api/cart/menu-items"},
+                    {"method": "GET", "path": "/api/orders"},
+                ]
+            },
+            json=True,
+        ),
+        # Performance metrics and profiling endpoints.
+        Scenario("metrics GET", "GET", "metrics", "manager"),
+        Scenario("profiles GET", "GET", "profiles", "manager", setup=_new_profile),
+        Scenario(
+            "profiles/<pk> GET",
+            "GET",
+            "profiles/{profile}",
+            "manager",
+            setup=_new_profile,
+        ),
+    ]
+
+
+def get_fixtures():
+    """
+    Return the ids of existing objects to benchmark against.
+
+    Expects data created by LittleLemonAPI.seeding, and creates the users playing
+    the customer and target roles of the benchmark.
+    """
+    seed_users = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX)
+    manager = seed_users.filter(groups__name="Manager").order_by("pk").first()
+    delivery_crew = (
+        seed_users.filter(groups__name="Delivery crew").order_by("pk").first()
+    )
+    customer, _ = User.objects.get_or_create(
+        username=f"{BENCHMARK_USERNAME_PREFIX}customer"
+    )
+    target, _ = User.objects.get_or_create(
+        username=f"{BENCHMARK_USERNAME_PREFIX}target"
+    )
+    menuitem = MenuItem.objects.order_by("pk").first()
+    order = Order.objects.order_by("pk").first()
+    if None in (manager, delivery_crew, menuitem, order):
+        raise ValueError("Database must be seeded before benchmarking")
+    return {
+        "manager": manager.pk,
+        "delivery_crew": delivery_crew.pk,
+        "customer": customer.pk,
+        "target": target.pk,
+        "target_username": target.username,
+        "category": Category.objects.order_by("pk").values_list("pk", flat=True)[0],
+        "menuitem": menuitem.pk,
+        "menuitem_title": menuitem.title,
+        "order": order.pk,
+    }
+
+
+def get_clients(fixtures):
+    """Return a test client logged in for each role."""
+    clients = {"anonymous": Client()}
+    for role in ("manager", "delivery_crew", "customer"):
+        clients[role] = Client()
+        clients[role].force_login(User.objects.get(pk=fixtures[role]))
+    return clients
+
+
+@contextmanager
+def unthrottled():
+    """
+    Temporarily disable throttling on all views in LittleLemonAPI.urls.
+
+    Benchmarks measure the cost of serving requests, not of rejecting them.
+    """
+    view_classes = {
+        pattern.callback.view_class
+        for pattern in urls.urlpatterns
+        if hasattr(pattern.callback, "view_class")
+    }
+    saved = {
+        view_class: view_class.__dict__.get("throttle_classes")
+        for view_class in view_classes
+    }
+    for view_class in view_classes:
+        view_class.throttle_classes = []
+    try:
+        yield
+    finally:
+        for view_class, throttle_classes in saved.items():
+            if throttle_classes is None:
+                del view_class.throttle_classes
+            else:
+                view_class.throttle_classes = throttle_classes
+
+
+@contextmanager
+def rolled_back():
+    """Roll back all writes made in the block, leaving the database unchanged."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize(latencies):
+    """Return latency percentiles in milliseconds for a list of seconds."""
+    return {
+        "count": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+def run_scenario(scenario, client, fixtures, iterations):
+    """Run a scenario sequentially, measuring latency and query count."""
+    latencies = []
+    queries = []
+    errors = 0
+    for _ in range(iterations):
+        path, body, content_type = scenario.build(fixtures)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.generic(scenario.method, path, body, content_type)
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(captured))
+        if response.status_code >= 400:
+            errors += 1
+
+    result = summarize(latencies)
+    result.update(
+        {
+            "method": scenario.method,
+            "path": scenario.path,
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / sum(latencies), 1),
+            "queries": max(queries),
+        }
+    )
+    return result
+
+
+def run_load(scenarios, fixtures, concurrency, requests):
+    """
+    Run read scenarios round-robin from concurrent threads.
+
+    Every thread has its own clients and database connection.
+    """
+    read_scenarios = [scenario for scenario in scenarios if scenario.is_read]
+    worker_clients = [get_clients(fixtures) for _ in range(concurrency)]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(index, clients):
+        try:
+            for number in range(index, requests, concurrency):
+                scenario = read_scenarios[number % len(read_scenarios)]
+                path, body, content_type = scenario.build(fixtures)
+                start = time.perf_counter()
+                response = clients[scenario.role].generic(
+                    scenario.method, path, body, content_type
+                )
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status_code >= 400:
+                        errors.append(scenario.name)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=worker, args=(index, clients))
+        for index, clients in enumerate(worker_clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    result = summarize(latencies)
+    result.update(
+        {
+            "concurrency": concurrency,
+            "errors": len(errors),
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+        }
+    )
+    return result
+
+
+def run_compression(scenarios, clients, fixtures, iterations):
+    """
+    Compress the responses of read scenarios at several levels, measuring the
+    compression ratio against the CPU time spent.
+    """
+    bodies = []
+    for scenario in scenarios:
+        if not scenario.is_read:
+            continue
+        path, body, content_type = scenario.build(fixtures)
+        response = clients[scenario.role].generic("GET", path, body, content_type)
+        if not response.streaming and not response.has_header("Content-Encoding"):
+            bodies.append(response.content)
+
+    levels = [("gzip", 1), ("gzip", 6), ("gzip", 9)]
+    if brotli:
+        levels += [("br", 4), ("br", 11)]
+    size = sum(len(body) for body in bodies)
+    results = []
+    for encoding, level in levels:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            compressed_size = sum(
+                len(compress(body, encoding, level)) for body in bodies
+            )
+        elapsed = (time.perf_counter() - start) / iterations
+        results.append(
+            {
+                "encoding": encoding,
+                "level": level,
+                "bytes": size,
+                "compressed_bytes": compressed_size,
+                "ratio": round(size / compressed_size, 2),
+                "ms_per_mb": round(elapsed * 1000 / (size / 1e6), 2),
+            }
+        )
+    return results
+
+
+def run_benchmark(
+    iterations=20, concurrency=4, load_requests=200, scenarios=None, compression=False
+):
+    """
+    Benchmark every scenario and return a JSON serializable report.
+
+    Scenarios are first run sequentially to measure latency and query counts, and
+    the read scenarios are then run concurrently to measure throughput. Write
+    scenarios are run in a transaction rolled back afterwards, so their latency
+    excludes committing. With
+    compression, the cost of compressing read responses is measured too.
+    """
+    scenarios = scenarios or get_scenarios()
+    fixtures = get_fixtures()
+    clients = get_clients(fixtures)
+    report = {
+        "meta": {
+            "vendor": connection.vendor,
+            "iterations": iterations,
+            "menu_items": MenuItem.objects.count(),
+            "orders": Order.objects.count(),
+        },
+        "endpoints": {},
+    }
+    with unthrottled():
+        for scenario in scenarios:
+            # Writes, and the objects created by setups, are rolled back, so
+            # benchmarks can be run against any database.
+            with nullcontext() if scenario.is_read else rolled_back():
+                report["endpoints"][scenario.name] = run_scenario(
+                    scenario, clients[scenario.role], fixtures, iterations
+                )
+        if concurrency and load_requests:
+            report["load"] = run_load(scenarios, fixtures, concurrency, load_requests)
+        if compression:
+            report["compression"] = run_compression(
+                scenarios, clients, fixtures, iterations
+            )
+    return report
+
+
+def compare_to_baseline(report, baseline, tolerance=0.2):
+    """
+    Return a list of regressions of a report compared to a baseline report.
+
+    An endpoint regresses when its p95 latency exceeds the baseline by more than
+    tolerance, or when it executes more queries than the baseline.
+    """
+    regressions = []
+    for name, result in report["endpoints"].items():
+        expected = baseline.get("endpoints", {}).get(name)
+        if expected is None:
+            continue
+        if result["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {result['p95_ms']}ms, baseline {expected['p95_ms']}ms"
+            )
+        if result["queries"] > expected["queries"]:
+            regressions.append(
+                f"{name}: {result['queries']} queries, baseline {expected['queries']}"
+            )
+    return regressions
@@ -0,0 +1,51 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics, pagination
+from .models import Cart
+
+logger = logging.getLogger(__name__)
+
+
+def get_expiry():
+    """Return the time before which cart lines not updated have expired."""
+    days = getattr(settings, "CART_TTL_DAYS", 7)
+    # Truncated to the minute, so cart counts are cached within each minute, see
+    # LittleLemonAPI.pagination.
+    return timezone.now().replace(second=0, microsecond=0) - timedelta(days=days)
+
+
+def active_carts():
+    """Return cart lines which have not expired."""
+    return Cart.objects.filter(updated__gte=get_expiry())
+
+
+def purge_expired(batch_size: int = 1000, sleep: float = 0):
+    """
+    Delete expired cart lines in batches, each deleted by a short statement of its
+    own, sleeping between batches to let other writers through.
+
+    Returns the number of cart lines deleted, which is also logged and added to
+    the persistent carts_purged counter of LittleLemonAPI.metrics.
+    """
+    expiry = get_expiry()
+    purged_count = 0
+    while True:
+        cart_ids = list(
+            Cart.objects.filter(updated__lt=expiry).values_list("pk", flat=True)[
+                :batch_size
+            ]
+        )
+        if not cart_ids:
+            logger.info("Purged %s expired cart lines", purged_count)
+            return purged_count
+        if purged_count and sleep:
+            time.sleep(sleep)
+        batch_count, _ = Cart.objects.filter(pk__in=cart_ids).delete()
+        metrics.increment("carts_purged", batch_count)
+        pagination.invalidate_counts(Cart)
+        purged_count += batch_count
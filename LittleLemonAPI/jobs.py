@@ -0,0 +1,150 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Handlers of jobs by name, added with the register decorator.
+handlers = {}
+
+
+def register(name: str, batch: bool = False):
+    """
+    Register a function as the handler of jobs with a name.
+
+    Handlers are called with the payload of a job, or with a list of payloads of
+    all claimed jobs with the name if batch is True.
+    """
+
+    def decorator(function):
+        handlers[name] = (function, batch)
+        return function
+
+    return decorator
+
+
+def enqueue(name: str, payload: dict, **kwargs):
+    """
+    Add a job to the queue.
+
+    When called in the transaction writing the data a job is about to process,
+    the job is only visible to workers once that transaction commits.
+    """
+    return Job.objects.create(name=name, payload=payload, **kwargs)
+
+
+def enqueue_many(name: str, payloads):
+    """Add a job for each payload to the queue with one insert."""
+    return Job.objects.bulk_create(
+        [Job(name=name, payload=payload) for payload in payloads]
+    )
+
+
+def claim(batch_size: int, visibility_timeout: timedelta):
+    """
+    Claim and return up to batch_size jobs for this worker.
+
+    Jobs are claimed with one conditional update, so concurrent workers never
+    claim the same job. Claimed jobs not finished within visibility_timeout can
+    be claimed again, unless out of attempts, as they may crash their worker.
+    """
+    now = timezone.now()
+    Job.objects.filter(
+        status=Job.RUNNING, locked_until__lt=now, attempts__gte=F("max_attempts")
+    ).update(
+        status=Job.FAILED,
+        lock_token="",
+        last_error="Timed out on the last attempt",
+    )
+    available = Q(status=Job.PENDING, run_after__lte=now) | Q(
+        status=Job.RUNNING, locked_until__lt=now, attempts__lt=F("max_attempts")
+    )
+    job_ids = list(
+        Job.objects.filter(available)
+        .order_by("run_after")
+        .values_list("pk", flat=True)[:batch_size]
+    )
+    if not job_ids:
+        return []
+
+    lock_token = uuid.uuid4().hex
+    Job.objects.filter(available, pk__in=job_ids).update(
+        status=Job.RUNNING,
+        locked_until=now + visibility_timeout,
+        lock_token=lock_token,
+        attempts=F("attempts") + 1,
+    )
+    return list(Job.objects.filter(lock_token=lock_token).order_by("pk"))
+
+
+def retry_delay(attempts: int):
+    """Return the exponential backoff delay before retrying a failed job."""
+    return timedelta(seconds=min(2**attempts, 3600))
+
+
+def fail(jobs, error: Exception):
+    """
+    Reschedule failed jobs, or mark them failed once out of attempts.
+
+    Jobs reclaimed by another worker after their visibility timeout are left to
+    that worker.
+    """
+    now = timezone.now()
+    for job in jobs:
+        logger.exception("Job %s failed", job, exc_info=error)
+        if job.attempts >= job.max_attempts:
+            status, run_after = Job.FAILED, job.run_after
+        else:
+            status, run_after = Job.PENDING, now + retry_delay(job.attempts)
+        Job.objects.filter(pk=job.pk, lock_token=job.lock_token).update(
+            status=status, run_after=run_after, lock_token="", last_error=repr(error)
+        )
+
+
+def run(jobs):
+    """
+    Run claimed jobs, deleting successful jobs and rescheduling failed ones.
+
+    Returns the number of successful jobs. Jobs reclaimed by another worker
+    while running are not deleted.
+    """
+    jobs_by_name = {}
+    for job in jobs:
+        jobs_by_name.setdefault(job.name, []).append(job)
+
+    done = []
+    for name, named_jobs in jobs_by_name.items():
+        if name not in handlers:
+            fail(named_jobs, LookupError(f"No handler registered for job {name}"))
+            continue
+
+        handler, batch = handlers[name]
+        if batch:
+            try:
+                handler([job.payload for job in named_jobs])
+            except Exception as error:
+                fail(named_jobs, error)
+            else:
+                done.extend(named_jobs)
+            continue
+
+        for job in named_jobs:
+            try:
+                handler(job.payload)
+            except Exception as error:
+                fail([job], error)
+            else:
+                done.append(job)
+
+    # Jobs of one claim share their lock token.
+    done_ids_by_token = {}
+    for job in done:
+        done_ids_by_token.setdefault(job.lock_token, []).append(job.pk)
+    for lock_token, done_ids in done_ids_by_token.items():
+        Job.objects.filter(pk__in=done_ids, lock_token=lock_token).delete()
+    return len(done)
@@ -0,0 +1,169 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import pagination
+from .models import OrderItem, PrepTask
+
+DEFAULTS = {
+    # Number of queued tasks loaded into the in-memory queue at once.
+    "QUEUE_SIZE": 500,
+    # Seconds before the in-memory queue is reloaded, to pick up tasks created
+    # by other processes, such as the runjobs worker.
+    "REFRESH_SECONDS": 2,
+    # Seconds before tasks claimed but not completed are queued again, such as
+    # tasks of stations gone offline.
+    "CLAIM_TIMEOUT_SECONDS": 1800,
+}
+
+
+def get_setting(name: str):
+    return getattr(settings, "KITCHEN", {}).get(name, DEFAULTS[name])
+
+
+class PrepQueue:
+    """
+    In-memory priority queue of the ids of queued prep tasks, by start_by.
+
+    The queue is loaded from the database, where the priority of every task is
+    kept in its start_by field, and reloaded when empty or stale, so it picks up
+    tasks created by any process. Every process keeps its own queue, so tasks are
+    claimed by a conditional update, and tasks already claimed by stations served
+    by other processes are skipped.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.loaded = None
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.heap = []
+            self.loaded = None
+
+    def load(self):
+        requeue_expired()
+        self.heap = list(
+            PrepTask.objects.filter(status=PrepTask.QUEUED)
+            .order_by("start_by", "pk")
+            .values_list("start_by", "pk")[: get_setting("QUEUE_SIZE")]
+        )
+        # Already sorted, so this is a valid heap.
+        self.loaded = time.monotonic()
+
+    def pop(self):
+        """Return the id of the queued task to start first, or None if empty."""
+        with self.lock:
+            if (
+                not self.heap
+                or self.loaded is None
+                or time.monotonic() - self.loaded > get_setting("REFRESH_SECONDS")
+            ):
+                self.load()
+            if not self.heap:
+                return None
+            return heapq.heappop(self.heap)[1]
+
+    def claim(self, station: str):
+        """
+        Claim the queued task to start first for a station and return its id.
+
+        Returns None if no task is queued. Concurrent stations never claim the
+        same task, as only one conditional update of a queued task succeeds.
+        """
+        while True:
+            task_id = self.pop()
+            if task_id is None:
+                return None
+            claimed = PrepTask.objects.filter(
+                pk=task_id, status=PrepTask.QUEUED
+            ).update(status=PrepTask.CLAIMED, station=station, claimed=timezone.now())
+            if claimed:
+                pagination.invalidate_counts(PrepTask)
+                return task_id
+
+
+# Queue of this process, shared by all threads.
+queue = PrepQueue()
+
+
+def requeue_expired():
+    """Queue tasks claimed over KITCHEN["CLAIM_TIMEOUT_SECONDS"] ago again."""
+    expired = timezone.now() - timedelta(seconds=get_setting("CLAIM_TIMEOUT_SECONDS"))
+    requeued = PrepTask.objects.filter(
+        status=PrepTask.CLAIMED, claimed__lt=expired
+    ).update(status=PrepTask.QUEUED, station="", claimed=None)
+    if requeued:
+        pagination.invalidate_counts(PrepTask)
+    return requeued
+
+
+def get_start_by(ordered: datetime, prep_time: int, order_prep_time: int):
+    """
+    Return when to start preparing an item, to be ready with its whole order.
+
+    Items of an order taking longer to prepare are started earlier, so all items
+    of the order are ready at the same time.
+    """
+    return ordered + timedelta(minutes=order_prep_time - prep_time)
+
+
+def create_tasks(orders):
+    """
+    Create the prep tasks of all items of orders, queued by their start_by.
+
+    orders maps order ids to when they were ordered, or their jobs were run.
+    Items already having a prep task are skipped, so retried jobs don't create
+    duplicates. Queues of all processes pick up the tasks when reloaded.
+    """
+    order_items = list(
+        OrderItem.objects.filter(order_id__in=orders, prep_task__isnull=True)
+        .select_related("menuitem")
+        .only("order_id", "menuitem_id", "quantity", "menuitem__prep_time")
+    )
+    order_prep_times = {}
+    for order_item in order_items:
+        order_prep_times[order_item.order_id] = max(
+            order_prep_times.get(order_item.order_id, 0),
+            order_item.menuitem.prep_time,
+        )
+
+    tasks = PrepTask.objects.bulk_create(
+        [
+            PrepTask(
+                order_id=order_item.order_id,
+                order_item=order_item,
+                menuitem_id=order_item.menuitem_id,
+                quantity=order_item.quantity,
+                prep_time=order_item.menuitem.prep_time,
+                start_by=get_start_by(
+                    orders[order_item.order_id],
+                    order_item.menuitem.prep_time,
+                    order_prep_times[order_item.order_id],
+                ),
+            )
+            for order_item in order_items
+        ]
+    )
+    pagination.invalidate_counts(PrepTask)
+    return tasks
+
+
+def complete(task_id: int, station: str):
+    """
+    Mark a task claimed by a station as done, and return whether it was.
+
+    Tasks requeued after their claim expired, and claimed again by another
+    station, are only completed by that station.
+    """
+    completed = PrepTask.objects.filter(
+        pk=task_id, status=PrepTask.CLAIMED, station=station
+    ).update(status=PrepTask.DONE, completed=timezone.now())
+    if completed:
+        pagination.invalidate_counts(PrepTask)
+    return bool(completed)
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from LittleLemonAPI import archive
+
+
+class Command(BaseCommand):
+    help = "Move delivered orders older than the archive horizon to the archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Archive orders older than this many days, instead of "
+            "settings.ORDER_ARCHIVE_AFTER_DAYS.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        before = None
+        if options["days"] is not None:
+            before = timezone.localdate() - timedelta(days=options["days"])
+        archived_count = archive.archive_orders(before, options["batch_size"])
+        self.stdout.write(f"Archived {archived_count} orders")
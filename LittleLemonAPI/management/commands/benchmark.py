@@ -0,0 +1,100 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from LittleLemonAPI import seeding
+from LittleLemonAPI.benchmark import run_benchmark, compare_to_baseline
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API endpoint, reporting latency percentiles, throughput "
+        "and query counts, and optionally compare against a JSON baseline. Use the "
+        "seed command to benchmark against larger data sets."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed", action="store_true", help="Seed synthetic data before running."
+        )
+        parser.add_argument("--categories", type=int, default=5)
+        parser.add_argument("--menu-items", type=int, default=50)
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--orders", type=int, default=100)
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--load-requests", type=int, default=200)
+        parser.add_argument(
+            "--compression",
+            action="store_true",
+            help="Measure the cost and ratio of compressing read responses.",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+        parser.add_argument("--baseline", help="JSON report to compare against.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed relative p95 latency increase over the baseline.",
+        )
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            seeding.seed(
+                categories=options["categories"],
+                menu_items=options["menu_items"],
+                users=options["users"],
+                orders=options["orders"],
+            )
+
+        # The test client uses the "testserver" host.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            try:
+                report = run_benchmark(
+                    iterations=options["iterations"],
+                    concurrency=options["concurrency"],
+                    load_requests=options["load_requests"],
+                    compression=options["compression"],
+                )
+            except ValueError as error:
+                raise CommandError(f"{error}, run with --seed")
+
+        self.stdout.write(
+            f"{'endpoint':<42}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'queries':>9}"
+        )
+        rows = list(report["endpoints"].items())
+        if "load" in report:
+            rows.append((f"concurrent reads x{options['concurrency']}", report["load"]))
+        for name, result in rows:
+            self.stdout.write(
+                f"{name:<42}{result['p50_ms']:>9}{result['p95_ms']:>9}"
+                f"{result['p99_ms']:>9}{result['throughput_rps']:>9}"
+                f"{result.get('queries', ''):>9}"
+            )
+
+        if "compression" in report:
+            self.stdout.write(
+                f"\n{'compression':<42}{'ratio':>9}{'ms/MB':>9}{'bytes':>12}"
+            )
+            for result in report["compression"]:
+                self.stdout.write(
+                    f"{result['encoding'] + ' ' + str(result['level']):<42}"
+                    f"{result['ratio']:>9}{result['ms_per_mb']:>9}"
+                    f"{result['compressed_bytes']:>12}"
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+            regressions = compare_to_baseline(report, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError(
+                    "Performance regressions:\n" + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
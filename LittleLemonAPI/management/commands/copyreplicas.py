@@ -0,0 +1,26 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from LittleLemon import db_routers
+
+
+class Command(BaseCommand):
+    help = "Copy the default SQLite database to all SQLite read replicas."
+
+    def handle(self, *args, **options):
+        primary = connections["default"]
+        if primary.vendor != "sqlite":
+            raise CommandError("Only SQLite databases can be copied")
+        source = sqlite3.connect(primary.settings_dict["NAME"])
+        for alias in db_routers.get_replicas():
+            replica = connections[alias]
+            if replica.vendor != "sqlite":
+                raise CommandError(f"Replica {alias} is not a SQLite database")
+            # The backup API copies a consistent snapshot while the primary is used.
+            replica.close()
+            with sqlite3.connect(replica.settings_dict["NAME"]) as target:
+                source.backup(target)
+            self.stdout.write(f"Copied primary to {alias}")
+        source.close()
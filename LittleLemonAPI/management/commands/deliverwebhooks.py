@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI import webhooks
+
+
+class Command(BaseCommand):
+    help = "Deliver order events from the outbox to webhook subscribers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Maximum concurrent requests, in total and per host.",
+        )
+        parser.add_argument("--timeout", type=float, default=10)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when there is nothing to deliver.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Exit once nothing is delivered."
+        )
+
+    def handle(self, *args, **options):
+        pool = webhooks.ConnectionPool(
+            max_connections=options["concurrency"], timeout=options["timeout"]
+        )
+        try:
+            while True:
+                delivered_count = webhooks.deliver(
+                    pool, options["batch_size"], options["concurrency"]
+                )
+                webhooks.prune()
+                if delivered_count:
+                    if options["verbosity"] > 1:
+                        self.stdout.write(f"Delivered {delivered_count} events")
+                elif options["once"]:
+                    return
+                else:
+                    time.sleep(options["sleep"])
+        finally:
+            pool.close()
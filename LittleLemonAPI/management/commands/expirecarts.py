@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI import carts
+
+
+class Command(BaseCommand):
+    help = "Delete cart lines not updated within settings.CART_TTL_DAYS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to wait between batches.",
+        )
+
+    def handle(self, *args, **options):
+        purged_count = carts.purge_expired(options["batch_size"], options["sleep"])
+        self.stdout.write(f"Deleted {purged_count} expired cart lines")
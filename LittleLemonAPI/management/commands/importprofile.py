@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def parse_importtime(output: str):
+    """Return (module, self_us, cumulative_us) of python -X importtime output."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        imports.append((module.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile the imports of starting a WSGI or ASGI worker in a fresh "
+        "interpreter, and print the slowest modules."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--asgi", action="store_true", help="Profile asgi.py.")
+        parser.add_argument("--top", type=int, default=20)
+
+    def handle(self, *args, **options):
+        module = "LittleLemon.asgi" if options["asgi"] else "LittleLemon.wsgi"
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+            },
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+
+        imports = parse_importtime(result.stderr)
+        total_us = sum(self_us for _, self_us, _ in imports)
+        self.stdout.write(
+            f"{module} with {settings.SETTINGS_MODULE}: "
+            f"{len(imports)} modules in {total_us / 1000:.1f}ms"
+        )
+        for title, index in (("cumulative", 2), ("self", 1)):
+            self.stdout.write(f"\nSlowest by {title} time:")
+            for row in sorted(imports, key=lambda row: -row[index])[: options["top"]]:
+                self.stdout.write(f"{row[index] / 1000:8.1f}ms  {row[0]}")
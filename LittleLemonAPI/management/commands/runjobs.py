@@ -0,0 +1,41 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI import jobs
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the job queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--visibility-timeout",
+            type=int,
+            default=300,
+            help="Seconds before a claimed but unfinished job is retried.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Exit once the queue is empty."
+        )
+
+    def handle(self, *args, **options):
+        visibility_timeout = timedelta(seconds=options["visibility_timeout"])
+        while True:
+            claimed = jobs.claim(options["batch_size"], visibility_timeout)
+            if claimed:
+                done_count = jobs.run(claimed)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"Ran {done_count} of {len(claimed)} jobs")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["sleep"])
@@ -0,0 +1,56 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from LittleLemonAPI.seeding import seed, SEED_USERNAME_PREFIX
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed the database with deterministic synthetic users, menu, carts, and "
+        "orders for scale testing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=10)
+        parser.add_argument("--menu-items", type=int, default=1000)
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--carts", type=int, default=1000)
+        parser.add_argument("--orders", type=int, default=100000)
+        parser.add_argument("--max-items-per-order", type=int, default=5)
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Spread order dates over this many days.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--random-seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).exists():
+            raise CommandError("Database is already seeded")
+
+        if connection.vendor == "sqlite" and not connection.in_atomic_block:
+            # Seeded data is disposable, so trade durability for write speed.
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA synchronous = OFF")
+
+        start = time.perf_counter()
+        seed(
+            categories=options["categories"],
+            menu_items=options["menu_items"],
+            users=options["users"],
+            carts=options["carts"],
+            orders=options["orders"],
+            max_items_per_order=options["max_items_per_order"],
+            days=options["days"],
+            batch_size=options["batch_size"],
+            random_seed=options["random_seed"],
+            log=self.stdout.write if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Seeded database in {time.perf_counter() - start:.1f}s")
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI import warmup
+
+
+class Command(BaseCommand):
+    help = "Run the worker warm up steps and print their durations."
+
+    def handle(self, *args, **options):
+        for name, (count, duration) in warmup.warm_up().items():
+            self.stdout.write(f"{name}: {count} items in {duration:.1f}ms")
@@ -0,0 +1,214 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from django.core.cache import cache
+
+# Counters incremented by short-lived processes such as management commands, so
+# kept in the cache shared by all processes instead of process memory.
+PERSISTENT_COUNTERS = ("carts_purged",)
+
+# Upper bounds of latency histogram buckets in milliseconds.
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """A cumulative histogram of observed values, as exported by Prometheus."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"count": self.count, "sum": round(self.sum, 3), "buckets": buckets}
+
+
+class RouteMetrics:
+    """Aggregated timings of all requests to one route and method."""
+
+    TIMINGS = ("total", "db", "view", "render")
+
+    def __init__(self):
+        self.histograms = {name: Histogram() for name in self.TIMINGS}
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def observe(self, timings: "RequestTimings"):
+        for name in self.TIMINGS:
+            self.histograms[name].observe(getattr(timings, name))
+        self.queries += timings.queries
+        self.cache_hits += timings.cache_hits
+        self.cache_misses += timings.cache_misses
+
+    def snapshot(self):
+        return {
+            **{f"{name}_ms": self.histograms[name].snapshot() for name in self.TIMINGS},
+            "queries": self.queries,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+
+class RequestTimings:
+    """
+    Timings of a single request in milliseconds.
+
+    The view timing includes serialization, as serializers are evaluated by views.
+    """
+
+    def __init__(self):
+        self.total = 0.0
+        self.db = 0.0
+        self.view = 0.0
+        self.render = 0.0
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Sub-requests of batches record timings from concurrent threads.
+        self.lock = threading.Lock()
+
+    def add_query(self, duration: float):
+        with self.lock:
+            self.db += duration
+            self.queries += 1
+
+    def server_timing(self):
+        """Return the value of a Server-Timing header for the request."""
+        return ", ".join(
+            [
+                f"total;dur={self.total:.2f}",
+                f'db;dur={self.db:.2f};desc="{self.queries} queries"',
+                f"view;dur={self.view:.2f}",
+                f"render;dur={self.render:.2f}",
+                f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            ]
+        )
+
+
+_lock = threading.Lock()
+_routes = {}
+_counters = {}
+_current_timings = ContextVar("current_timings", default=None)
+
+
+def start_request():
+    """Start recording timings of the current request and return them."""
+    timings = RequestTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def finish_request(method: str, route: str, timings: RequestTimings):
+    """Stop recording the current request and aggregate its timings."""
+    _current_timings.set(None)
+    with _lock:
+        _routes.setdefault((method, route), RouteMetrics()).observe(timings)
+
+
+def record_cache(hit: bool):
+    """Record a cache hit or miss for the current request, if any."""
+    timings = _current_timings.get()
+    if timings is None:
+        return
+    with timings.lock:
+        if hit:
+            timings.cache_hits += 1
+        else:
+            timings.cache_misses += 1
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper recording queries of the current request."""
+    timings = _current_timings.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if timings is not None:
+            timings.add_query((time.perf_counter() - start) * 1000)
+
+
+def get_counter_key(name: str):
+    return f"metrics-counter:{name}"
+
+
+def increment(name: str, amount: int = 1):
+    """Increment a named process-wide, or persistent, counter."""
+    if name in PERSISTENT_COUNTERS:
+        key = get_counter_key(name)
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            cache.set(key, amount, None)
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def snapshot():
+    """Return all metrics as a JSON serializable dict."""
+    persistent_counters = cache.get_many(
+        [get_counter_key(name) for name in PERSISTENT_COUNTERS]
+    )
+    with _lock:
+        return {
+            "routes": [
+                {"method": method, "route": route, **metrics.snapshot()}
+                for (method, route), metrics in sorted(_routes.items())
+            ],
+            "counters": {
+                **_counters,
+                **{
+                    name: persistent_counters[get_counter_key(name)]
+                    for name in PERSISTENT_COUNTERS
+                    if get_counter_key(name) in persistent_counters
+                },
+            },
+        }
+
+
+def reset():
+    """Discard all collected metrics."""
+    cache.delete_many([get_counter_key(name) for name in PERSISTENT_COUNTERS])
+    with _lock:
+        _routes.clear()
+        _counters.clear()
+
+
+def render_prometheus(data: dict):
+    """Render a metrics snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name in RouteMetrics.TIMINGS:
+        metric = f"littlelemon_request_{name}_milliseconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for route in data["routes"]:
+            labels = f'method="{route["method"]}",route="{route["route"]}"'
+            histogram = route[f"{name}_ms"]
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{metric}_sum{{{labels}}} {histogram['sum']}")
+            lines.append(f"{metric}_count{{{labels}}} {histogram['count']}")
+    for name in ("queries", "cache_hits", "cache_misses"):
+        metric = f"littlelemon_request_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for route in data["routes"]:
+            labels = f'method="{route["method"]}",route="{route["route"]}"'
+            lines.append(f"{metric}{{{labels}}} {route[name]}")
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"# TYPE littlelemon_{name}_total counter")
+        lines.append(f"littlelemon_{name}_total {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,273 @@
+import gzip
+import hashlib
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from LittleLemon import db_routers
+
+from . import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_DEFAULTS = {
+    # Smaller responses are not worth the CPU time, and may even grow.
+    "MIN_SIZE": 1024,
+    "GZIP_LEVEL": 6,
+    # Only used if the optional brotli package is installed.
+    "BROTLI_QUALITY": 4,
+    # Number of compressed bodies kept to serve identical responses again.
+    "CACHE_SIZE": 128,
+}
+
+# HTML pages are not compressed, as they may reflect secrets such as CSRF tokens
+# next to user input (BREACH).
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/xml",
+    "application/msgpack",
+    "application/cbor",
+    "text/plain",
+    "text/csv",
+)
+
+
+class PerformanceMiddleware:
+    """
+    Record timings of every request.
+
+    Timings are added to the response in a Server-Timing header, and aggregated
+    per route in LittleLemonAPI.metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = metrics.start_request()
+
+        start = time.perf_counter()
+        request._performance_marks = {}
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics.record_query))
+            response = self.get_response(request)
+        end = time.perf_counter()
+
+        marks = request._performance_marks
+        timings.total = (end - start) * 1000
+        if "view" in marks:
+            view_end = marks.get("view_end", end)
+            timings.view = (view_end - marks["view"]) * 1000
+            timings.render = (marks.get("render_end", view_end) - view_end) * 1000
+
+        match = request.resolver_match
+        route = match.route if match else "unmatched"
+        metrics.finish_request(request.method, route, timings)
+        response["Server-Timing"] = timings.server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._performance_marks["view"] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Template and DRF responses are rendered after the view returns.
+        marks = request._performance_marks
+        marks["view_end"] = time.perf_counter()
+        response.add_post_render_callback(
+            lambda response: marks.update(render_end=time.perf_counter())
+        )
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Read from the replicas in GET and HEAD requests.
+
+    Clients read from the primary for settings.READ_YOUR_WRITES_SECONDS after
+    a write, so they never see replicas lagging behind their own writes. Writes
+    set a short-lived cookie, so any worker on any host serves the next reads of
+    the client from the primary. Clients not sending cookies back, such as token
+    clients, are also tracked in the shared cache by their Authorization header
+    or session cookie.
+
+    Not used unless settings.DATABASE_REPLICAS are configured.
+    """
+
+    cookie_name = "read_primary"
+
+    def __init__(self, get_response):
+        if not db_routers.get_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def get_client_key(self, request):
+        credentials = request.headers.get("Authorization") or request.COOKIES.get(
+            settings.SESSION_COOKIE_NAME
+        )
+        if not credentials:
+            return None
+        return "replica-sticky:" + hashlib.sha256(credentials.encode()).hexdigest()
+
+    def reads_own_writes(self, request, client_key):
+        if self.cookie_name in request.COOKIES:
+            return True
+        return client_key is not None and bool(cache.get(client_key))
+
+    def __call__(self, request):
+        client_key = self.get_client_key(request)
+        if request.method in ("GET", "HEAD"):
+            if not self.reads_own_writes(request, client_key):
+                with db_routers.read_from_replicas():
+                    return self.get_response(request)
+            return self.get_response(request)
+
+        response = self.get_response(request)
+        timeout = getattr(settings, "READ_YOUR_WRITES_SECONDS", 5)
+        response.set_cookie(
+            self.cookie_name, "1", max_age=timeout, httponly=True, samesite="Lax"
+        )
+        if client_key is not None:
+            cache.set(client_key, True, timeout)
+        return response
+
+
+def get_compression_setting(name: str):
+    return getattr(settings, "COMPRESSION", {}).get(name, COMPRESSION_DEFAULTS[name])
+
+
+def parse_accept_encoding(header: str):
+    """Return the encodings accepted by a client, mapped to their quality."""
+    encodings = {}
+    for part in header.split(","):
+        encoding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                pass
+        if encoding:
+            encodings[encoding.lower()] = quality
+    return encodings
+
+
+def accepts_encoding(accepted: dict, encoding: str):
+    """Return whether encodings parsed by parse_accept_encoding include one."""
+    return accepted.get(encoding, accepted.get("*", 0)) > 0
+
+
+def compress(content: bytes, encoding: str, level=None):
+    """Compress content at a level, by default the one in settings."""
+    if encoding == "br":
+        quality = level or get_compression_setting("BROTLI_QUALITY")
+        return brotli.compress(content, quality=quality)
+    level = level or get_compression_setting("GZIP_LEVEL")
+    return gzip.compress(content, level, mtime=0)
+
+
+def compress_stream(chunks, encoding: str):
+    """Compress an iterable of chunks incrementally, yielding compressed chunks."""
+    if encoding == "br":
+        compressor = brotli.Compressor(
+            quality=get_compression_setting("BROTLI_QUALITY")
+        )
+        compress_chunk, finish = compressor.process, compressor.finish
+    else:
+        # wbits 31 writes a gzip header and trailer.
+        compressor = zlib.compressobj(get_compression_setting("GZIP_LEVEL"), wbits=31)
+        compress_chunk, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        compressed = compress_chunk(chunk)
+        if compressed:
+            yield compressed
+    yield finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, as accepted by the client.
+
+    Responses smaller than COMPRESSION["MIN_SIZE"], of types not worth
+    compressing, or already encoded, such as precompressed files, are sent as is.
+    Streaming responses are compressed chunk by chunk. Compressed bodies are kept
+    in a small LRU cache keyed by the hash of the body, so identical responses
+    are only compressed once.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.encodings = ["br", "gzip"] if brotli else ["gzip"]
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+    def negotiate(self, request):
+        accepted = parse_accept_encoding(request.headers.get("Accept-Encoding", ""))
+        for encoding in self.encodings:
+            if accepts_encoding(accepted, encoding):
+                return encoding
+        return None
+
+    def compress_cached(self, content: bytes, encoding: str):
+        key = (hashlib.sha1(content).digest(), encoding)
+        with self.cache_lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                metrics.record_cache(hit=True)
+                return self.cache[key]
+        compressed = compress(content, encoding)
+        metrics.record_cache(hit=False)
+        with self.cache_lock:
+            self.cache[key] = compressed
+            if len(self.cache) > get_compression_setting("CACHE_SIZE"):
+                self.cache.popitem(last=False)
+        return compressed
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.has_header("Content-Encoding")
+            or not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+            or "no-transform" in response.get("Cache-Control", "")
+        ):
+            return response
+        if not response.streaming and (
+            len(response.content) < get_compression_setting("MIN_SIZE")
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = self.negotiate(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding
+            )
+            # The length is only known once the stream is sent.
+            del response["Content-Length"]
+        else:
+            compressed = self.compress_cached(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        # Entity tags of compressed bodies differ from the uncompressed ones.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = f"W/{etag}"
+        response["Content-Encoding"] = encoding
+        return response
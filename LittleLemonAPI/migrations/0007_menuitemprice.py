@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_initial_price_versions(apps, schema_editor):
+    """Create a price version for every menu item and link matching cart lines."""
+    MenuItem = apps.get_model("LittleLemonAPI", "MenuItem")
+    MenuItemPrice = apps.get_model("LittleLemonAPI", "MenuItemPrice")
+    Cart = apps.get_model("LittleLemonAPI", "Cart")
+    for menuitem in MenuItem.objects.all():
+        price_version = MenuItemPrice.objects.create(
+            menuitem=menuitem, price=menuitem.price
+        )
+        MenuItem.objects.filter(pk=menuitem.pk).update(price_version=price_version)
+        # Cart lines with an outdated unit price are left unversioned, and are
+        # refreshed on checkout.
+        Cart.objects.filter(menuitem=menuitem, unit_price=menuitem.price).update(
+            price_version=price_version
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("LittleLemonAPI", "0006_alter_category_slug_alter_category_title"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MenuItemPrice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("price", models.DecimalField(decimal_places=2, max_digits=6)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "menuitem",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_versions",
+                        to="LittleLemonAPI.menuitem",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="cart",
+            name="price_version",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="LittleLemonAPI.menuitemprice",
+            ),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="price_version",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="LittleLemonAPI.menuitemprice",
+            ),
+        ),
+        migrations.RunPython(create_initial_price_versions, migrations.RunPython.noop),
+    ]
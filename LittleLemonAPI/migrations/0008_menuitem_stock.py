@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("LittleLemonAPI", "0007_menuitemprice"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="sold_out",
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="stock",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("LittleLemonAPI", "0009_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("event", models.CharField(max_length=50)),
+                ("order_id", models.BigIntegerField()),
+                ("payload", models.JSONField()),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="WebhookSubscriber",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField()),
+                ("events", models.JSONField(blank=True, default=list)),
+                ("secret", models.CharField(blank=True, max_length=100)),
+                ("active", models.BooleanField(default=True)),
+                ("last_event_id", models.BigIntegerField(default=0)),
+                ("failures", models.PositiveIntegerField(default=0)),
+                ("retry_after", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
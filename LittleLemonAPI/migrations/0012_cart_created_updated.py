@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("LittleLemonAPI", "0011_archivedorder"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cart",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="cart",
+            name="updated",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("LittleLemonAPI", "0012_cart_created_updated"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="prep_time",
+            field=models.PositiveSmallIntegerField(default=10),
+        ),
+        migrations.CreateModel(
+            name="PrepTask",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.SmallIntegerField()),
+                ("prep_time", models.PositiveSmallIntegerField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("claimed", "Claimed"),
+                            ("done", "Done"),
+                        ],
+                        default="queued",
+                        max_length=10,
+                    ),
+                ),
+                ("start_by", models.DateTimeField()),
+                ("station", models.CharField(blank=True, max_length=50)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("claimed", models.DateTimeField(blank=True, null=True)),
+                ("completed", models.DateTimeField(blank=True, null=True)),
+                (
+                    "menuitem",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="LittleLemonAPI.menuitem",
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="LittleLemonAPI.order",
+                    ),
+                ),
+                (
+                    "order_item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="prep_task",
+                        to="LittleLemonAPI.orderitem",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "start_by"],
+                        name="LittleLemon_status_84f959_idx",
+                    )
+                ],
+            },
+        ),
+    ]
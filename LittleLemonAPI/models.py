@@ -1,5 +1,8 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -19,17 +22,57 @@ class Category(models.Model):
         return f"({self.pk}) {self.title}"
 
 
+class MenuItemQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Update menu items, recording new price versions of changed prices."""
+        if "price" not in kwargs:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            menuitem_ids = list(self.values_list("pk", flat=True))
+            updated_count = super().update(**kwargs)
+            record_price_versions(menuitem_ids)
+        return updated_count
+
+
+def record_price_versions(menuitem_ids):
+    """Record price versions of menu items whose price differs from their version."""
+    menuitems = (
+        MenuItem.objects.filter(pk__in=menuitem_ids)
+        .exclude(price_version__price=models.F("price"))
+        .only("pk", "price")
+    )
+    for menuitem in menuitems:
+        price_version = MenuItemPrice.objects.create(
+            menuitem=menuitem, price=menuitem.price
+        )
+        MenuItem.objects.filter(pk=menuitem.pk).update(price_version=price_version)
+
+
 class MenuItem(models.Model):
     """
     An item on the menu belonging to a category.
 
-    Searchable against title, price, and featured fields.
+    Searchable against title, price, and featured fields, and filterable by
+    sold_out field.
+
+    stock field allows null value for items without stock tracking.
     """
 
     title = models.CharField(max_length=225, db_index=True)
     price = models.DecimalField(max_digits=6, decimal_places=2, db_index=True)
     featured = models.BooleanField(db_index=True)
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
+    stock = models.PositiveIntegerField(null=True, blank=True)
+    # Kept in sync with stock, so sold out items can be filtered by index.
+    sold_out = models.BooleanField(db_index=True, default=False)
+    # Minutes the kitchen needs to prepare the item, see LittleLemonAPI.kitchen.
+    prep_time = models.PositiveSmallIntegerField(default=10)
+    # Current immutable price version, replaced whenever price changes.
+    price_version = models.ForeignKey(
+        "MenuItemPrice", on_delete=models.SET_NULL, related_name="+", null=True
+    )
+
+    objects = MenuItemQuerySet.as_manager()
 
     class Meta:
         unique_together = ("title", "category")  # No duplicate items in same category.
@@ -37,6 +80,49 @@ class MenuItem(models.Model):
     def __str__(self) -> str:
         return f"({self.category.pk}) {self.category.title}: ({self.pk}) {self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        menuitem = super().from_db(db, field_names, values)
+        # Price as loaded, so saves only look up the price version if needed.
+        menuitem._loaded_price = menuitem.__dict__.get("price")
+        return menuitem
+
+    def save(self, *args, **kwargs):
+        self.sold_out = self.stock == 0
+        price = Decimal(str(self.price))
+        loaded_price = getattr(self, "_loaded_price", None)
+        if loaded_price is None and self.price_version_id is not None:
+            loaded_price = self.price_version.price
+        # The item is never saved without its current price version.
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+            # Record a new price version if the price is new or has changed.
+            if self.price_version_id is None or loaded_price != price:
+                self.price_version = MenuItemPrice.objects.create(
+                    menuitem=self, price=price
+                )
+                MenuItem.objects.filter(pk=self.pk).update(
+                    price_version=self.price_version
+                )
+        self._loaded_price = price
+
+
+class MenuItemPrice(models.Model):
+    """
+    An immutable version of the price of a menu item.
+
+    A new version is created every time the price of a menu item changes.
+    """
+
+    menuitem = models.ForeignKey(
+        MenuItem, on_delete=models.CASCADE, related_name="price_versions"
+    )
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"({self.menuitem_id}) {self.price}: ({self.pk}) Price version"
+
 
 class Cart(models.Model):
     """Shopping cart of a user."""
@@ -45,8 +131,15 @@ class Cart(models.Model):
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.SmallIntegerField()
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+    # Price version the unit price was copied from, revalidated at checkout.
+    price_version = models.ForeignKey(
+        MenuItemPrice, on_delete=models.CASCADE, null=True
+    )
     # Not needed as it is calculated in the serializer.
     # price = models.DecimalField(max_digits=6, decimal_places=2)
+    created = models.DateTimeField(auto_now_add=True)
+    # Lines not updated within settings.CART_TTL_DAYS expire.
+    updated = models.DateTimeField(db_index=True, auto_now=True)
 
     class Meta:
         unique_together = ("menuitem", "user")  # One entry per menuitem in a cart.
@@ -91,3 +184,149 @@ class OrderItem(models.Model):
 
     def __str__(self) -> str:
         return f"({self.order.user.pk}) {self.order.user.username}: ({self.order.pk}) Order: ({self.menuitem.pk}) {self.menuitem.title}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    A delivered order moved out of the Order table by LittleLemonAPI.archive.
+
+    Keeps the id and fields of the original order.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    delivery_crew = models.ForeignKey(
+        User, on_delete=models.SET_NULL, related_name="+", null=True
+    )
+    status = models.BooleanField(default=1)
+    total = models.DecimalField(max_digits=6, decimal_places=2)
+    date = models.DateField(db_index=True)
+
+    def __str__(self) -> str:
+        return f"({self.user_id}): ({self.pk}) Archived order"
+
+
+class ArchivedOrderItem(models.Model):
+    """An item in an archived order."""
+
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE)
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="+")
+    quantity = models.SmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+
+    def __str__(self) -> str:
+        return f"({self.order_id}) Archived order: ({self.menuitem_id}) Item"
+
+
+class PrepTask(models.Model):
+    """
+    Preparation of an order item in the kitchen, see LittleLemonAPI.kitchen.
+
+    Tasks are prepared in order of start_by, so older orders are prepared first
+    and the items of an order are ready at the same time. Claimed tasks are
+    being prepared by a kitchen station.
+    """
+
+    QUEUED = "queued"
+    CLAIMED = "claimed"
+    DONE = "done"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (CLAIMED, "Claimed"), (DONE, "Done")]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    order_item = models.OneToOneField(
+        OrderItem, on_delete=models.CASCADE, related_name="prep_task"
+    )
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="+")
+    quantity = models.SmallIntegerField()
+    # Copied from the menu item when the task is created.
+    prep_time = models.PositiveSmallIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    start_by = models.DateTimeField()
+    station = models.CharField(max_length=50, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    claimed = models.DateTimeField(null=True, blank=True)
+    completed = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "start_by"])]
+
+    def __str__(self) -> str:
+        return f"({self.order_id}) Order: ({self.pk}) {self.status} Prep task"
+
+
+class Job(models.Model):
+    """
+    A background job, run by the runjobs command.
+
+    Jobs are deleted once run successfully. Running jobs not finished before
+    locked_until are retried, and failed jobs are retried with backoff until
+    max_attempts is reached.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (RUNNING, "Running"), (FAILED, "Failed")]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True)
+    lock_token = models.CharField(max_length=32, db_index=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self) -> str:
+        return f"({self.pk}) {self.name}: {self.status}"
+
+
+class OrderEvent(models.Model):
+    """
+    An order event in the transactional outbox, delivered to webhook subscribers.
+
+    Events are written in the same transaction as the order change they record.
+    """
+
+    event = models.CharField(max_length=50)
+    # Not a foreign key, so events outlive deleted orders.
+    order_id = models.BigIntegerField()
+    payload = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"({self.order_id}) {self.event}: ({self.pk}) Order event"
+
+
+class WebhookSubscriber(models.Model):
+    """
+    An HTTP endpoint receiving batches of order events.
+
+    events field lists the event names to deliver, or all events if empty.
+    last_event_id field is the id of the last event delivered to the subscriber.
+    """
+
+    url = models.URLField()
+    events = models.JSONField(default=list, blank=True)
+    secret = models.CharField(max_length=100, blank=True)
+    active = models.BooleanField(default=True)
+    last_event_id = models.BigIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    retry_after = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"({self.pk}) {self.url}"
+
+    def save(self, *args, **kwargs):
+        # New subscribers only receive events from when they subscribed.
+        if self._state.adding and not self.last_event_id:
+            last_event = OrderEvent.objects.order_by("pk").last()
+            self.last_event_id = last_event.pk if last_event else 0
+        super().save(*args, **kwargs)
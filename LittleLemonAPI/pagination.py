@@ -0,0 +1,172 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+
+from . import metrics
+from .models import Cart, Category, MenuItem, Order, OrderItem
+
+DEFAULTS = {
+    # Seconds a count is cached, even without writes to its tables.
+    "COUNT_CACHE_TTL": 60,
+    # Above this many rows, lists are paginated without counting all rows.
+    "APPROXIMATE_COUNT_THRESHOLD": 10000,
+}
+
+
+def get_setting(name: str):
+    return getattr(settings, "PAGINATION", {}).get(name, DEFAULTS[name])
+
+
+def get_generation_key(table: str):
+    return f"count-generation:{table}"
+
+
+def invalidate_counts(*models):
+    """
+    Invalidate cached counts of queries over the tables of models.
+
+    Saves and deletes of list models, including cascading deletes, invalidate
+    counts through signals, so this is needed after bulk updates and inserts
+    only. Generations are kept in the cache shared by all processes, so writes
+    of management commands and the runjobs worker invalidate counts of all web
+    workers.
+    """
+    for model in models:
+        key = get_generation_key(model._meta.db_table)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_save, sender=Cart)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_save, sender=User)
+# Delete receivers disable fast deletes, so deleted rows are loaded, but cover
+# cascading deletes and deletes in the admin.
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_delete, sender=Cart)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_delete, sender=User)
+def invalidate_counts_on_write(sender, **kwargs):
+    invalidate_counts(sender)
+
+
+def get_count_cache_key(queryset):
+    """
+    Return the cache key of the count of a queryset.
+
+    Keys include the generations of all tables of the query, so writes to any
+    of them invalidate the count.
+    """
+    sql, params = queryset.query.sql_with_params()
+    tables = sorted(
+        {join.table_name for join in queryset.query.alias_map.values()}
+        | {queryset.model._meta.db_table}
+    )
+    keys = [get_generation_key(table) for table in tables]
+    generations = cache.get_many(keys)
+    signature = repr(
+        (queryset.db, sql, params, [generations.get(key, 0) for key in keys])
+    )
+    return "count:" + hashlib.sha1(signature.encode()).hexdigest()
+
+
+class ApproximatePage(Page):
+    """A page of a list too long to count, which knows if more pages follow."""
+
+    def __init__(self, object_list, number, paginator, has_more: bool):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator caching counts, and counting at most up to a threshold.
+
+    Lists with more rows than APPROXIMATE_COUNT_THRESHOLD are approximate: their
+    pages fetch one extra row to know if a next page exists.
+    """
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, "query"):
+            return super().count
+        key = get_count_cache_key(self.object_list)
+        count = cache.get(key)
+        metrics.record_cache(hit=count is not None)
+        if count is None:
+            # Stop counting past the threshold, instead of scanning all rows.
+            threshold = get_setting("APPROXIMATE_COUNT_THRESHOLD")
+            count = self.object_list[: threshold + 1].count()
+            cache.set(key, count, get_setting("COUNT_CACHE_TTL"))
+        return count
+
+    @property
+    def approximate(self):
+        return self.count > get_setting("APPROXIMATE_COUNT_THRESHOLD")
+
+    def validate_number(self, number):
+        if not self.approximate:
+            return super().validate_number(number)
+        # Pages past the counted rows may exist, so only check the number.
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise EmptyPage("That page number is less than 1")
+        return number
+
+    def page(self, number):
+        if not self.approximate:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom : bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage("That page contains no results")
+        return ApproximatePage(
+            rows[: self.per_page], number, self, len(rows) > self.per_page
+        )
+
+
+class CachedCountPagination(PageNumberPagination):
+    """
+    Page number pagination with cached counts, see CachedCountPaginator.
+
+    The count of approximate lists is null.
+    """
+
+    django_paginator_class = CachedCountPaginator
+
+    def get_page_number(self, request, paginator):
+        if (
+            request.query_params.get(self.page_query_param) in self.last_page_strings
+            and paginator.approximate
+        ):
+            # Approximate lists are not counted to their last page.
+            raise NotFound("The last page of this list is not known")
+        return super().get_page_number(request, paginator)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.page.paginator.approximate:
+            response.data["count"] = None
+        return response
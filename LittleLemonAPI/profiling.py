@@ -0,0 +1,221 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import socket
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+DEFAULTS = {
+    # Profiling is opt-in, the middleware is not used at all when disabled.
+    "ENABLED": False,
+    # Fraction of all requests profiled, regardless of the user.
+    "SAMPLE_RATE": 0.0,
+    # Number of most recent profiles kept in the cache.
+    "MAX_PROFILES": 50,
+    # Seconds profiles are kept in the cache.
+    "TIMEOUT": 3600,
+    # Number of functions listed in profile summaries.
+    "STATS_LIMIT": 40,
+}
+
+# Header and query parameter requesting a profile, honored for managers only.
+PROFILE_HEADER = "X-Profile"
+PROFILE_PARAMETER = "profile"
+
+# Profiles are kept in the cache, so all workers sharing it serve the profiles
+# of each other. Profiles list the worker that recorded them, as workers on other
+# hosts only share profiles with a cache such as Redis or Memcached.
+PROFILE_IDS_KEY = "profile-ids"
+WORKER = f"{socket.gethostname()}:{os.getpid()}"
+
+_lock = threading.Lock()
+
+
+def get_setting(name: str):
+    return getattr(settings, "PROFILING", {}).get(name, DEFAULTS[name])
+
+
+class Profile:
+    """The cProfile stats and SQL queries of a single request."""
+
+    def __init__(self, method: str, path: str):
+        self.id = str(uuid.uuid4())
+        self.worker = WORKER
+        self.method = method
+        self.path = path
+        self.status = None
+        self.user = None
+        self.created = timezone.now()
+        self.duration = 0.0
+        self.queries = []
+        self.stats = {}
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.queries.append({"sql": sql, "ms": round(duration, 3)})
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "user": self.user,
+            "worker": self.worker,
+            "created": self.created,
+            "duration_ms": round(self.duration, 3),
+            "queries": len(self.queries),
+            "db_ms": round(sum(query["ms"] for query in self.queries), 3),
+        }
+
+    def report(self):
+        """Return the functions with the highest cumulative time, as text."""
+        stream = io.StringIO()
+        stats = pstats.Stats(self, stream=stream)
+        stats.sort_stats("cumulative").print_stats(get_setting("STATS_LIMIT"))
+        return stream.getvalue()
+
+    def create_stats(self):
+        # Lets pstats.Stats load the stats of this profile.
+        pass
+
+    def dump(self):
+        """Return the stats in the file format of pstats and snakeviz."""
+        return marshal.dumps(self.stats)
+
+
+@contextmanager
+def profile(method: str, path: str):
+    """Context manager profiling code and its queries, and keeping the profile."""
+    current = Profile(method, path)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(current.record_query))
+        profiler.enable()
+        try:
+            yield current
+        finally:
+            profiler.disable()
+    current.duration = (time.perf_counter() - start) * 1000
+    profiler.create_stats()
+    current.stats = profiler.stats
+    save(current)
+
+
+def get_profile_key(profile_id: str):
+    return f"profile:{profile_id}"
+
+
+def save(current: Profile):
+    """Keep a profile, and drop the oldest ones over PROFILING["MAX_PROFILES"]."""
+    timeout = get_setting("TIMEOUT")
+    cache.set(get_profile_key(current.id), current, timeout)
+    # Workers update the list of ids without a shared lock, so a concurrent
+    # profile may be missing from the list, but is still found by its id.
+    with _lock:
+        profile_ids = [current.id, *cache.get(PROFILE_IDS_KEY, [])]
+        cache.set(PROFILE_IDS_KEY, profile_ids[: get_setting("MAX_PROFILES")], timeout)
+    cache.delete_many(
+        [
+            get_profile_key(profile_id)
+            for profile_id in profile_ids[get_setting("MAX_PROFILES") :]
+        ]
+    )
+
+
+def get_profiles():
+    """Return the kept profiles, most recent first."""
+    profile_ids = cache.get(PROFILE_IDS_KEY, [])
+    profiles = cache.get_many(
+        [get_profile_key(profile_id) for profile_id in profile_ids]
+    )
+    return [
+        profiles[get_profile_key(profile_id)]
+        for profile_id in profile_ids
+        if get_profile_key(profile_id) in profiles
+    ]
+
+
+def get_profile(profile_id: str):
+    return cache.get(get_profile_key(profile_id))
+
+
+def clear():
+    profile_ids = cache.get(PROFILE_IDS_KEY, [])
+    cache.delete_many(
+        [PROFILE_IDS_KEY, *[get_profile_key(profile_id) for profile_id in profile_ids]]
+    )
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests flagged by managers, and a random sample of all requests.
+
+    Requests are flagged with an X-Profile header or a ?profile query parameter,
+    and the id of their profile is returned in an X-Profile-Id header. Enabled by
+    PROFILING["ENABLED"] in settings.
+    """
+
+    def __init__(self, get_response):
+        if not get_setting("ENABLED"):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def get_user(self, request):
+        """Return the user of a request, authenticated by session or token."""
+        if request.user.is_authenticated:
+            return request.user
+        try:
+            auth = get_authorization_header(request).split()
+            if len(auth) == 2 and auth[0].lower() == b"token":
+                return TokenAuthentication().authenticate_credentials(auth[1].decode())[
+                    0
+                ]
+        except (exceptions.AuthenticationFailed, UnicodeError):
+            pass
+        return None
+
+    def should_profile(self, request):
+        if random.random() < get_setting("SAMPLE_RATE"):
+            return True
+        if PROFILE_HEADER not in request.headers and (
+            PROFILE_PARAMETER not in request.GET
+        ):
+            return False
+        # Imported here, as views import this module.
+        from .views import is_manager
+
+        user = self.get_user(request)
+        return user is not None and is_manager(user)
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        with profile(request.method, request.get_full_path()) as current:
+            response = self.get_response(request)
+            # Set before the profile is saved on exit.
+            current.status = response.status_code
+            if request.user.is_authenticated:
+                current.user = request.user.username
+        response["X-Profile-Id"] = str(current.id)
+        return response
@@ -0,0 +1,185 @@
+import logging
+import re
+import time
+import traceback
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Detection is opt-in, as it adds overhead to every query.
+    "ENABLED": False,
+    # Queries slower than this many milliseconds are reported.
+    "SLOW_QUERY_MS": 100,
+    # Queries of the same shape executed this many times in a request are reported.
+    "REPEATED_QUERY_THRESHOLD": 5,
+    # Raise QueryProblemsDetected instead of logging, to fail tests in CI.
+    "RAISE": False,
+}
+
+_string_literal = re.compile(r"'(?:[^']|'')*'")
+_number_literal = re.compile(r"\b\d+(?:\.\d+)?\b")
+_placeholder_list = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+
+
+def get_setting(name: str):
+    return getattr(settings, "QUERY_DETECTOR", {}).get(name, DEFAULTS[name])
+
+
+def normalize_sql(sql: str):
+    """
+    Return the shape of a SQL query, with literals and parameters replaced.
+
+    Queries that differ only in their parameters, such as lazy loads of the same
+    relation for different rows, have the same shape.
+    """
+    sql = _string_literal.sub("?", sql)
+    sql = _number_literal.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    return _placeholder_list.sub("(...)", sql)
+
+
+def get_stack():
+    """Return the frames of the call stack within the project, innermost last."""
+    base_dir = str(settings.BASE_DIR)
+    return [
+        f"{frame.filename}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base_dir)
+        and "site-packages" not in frame.filename
+        and frame.filename != __file__
+    ]
+
+
+class QueryProblemsDetected(AssertionError):
+    """Raised when queries exceed a budget or problems are detected."""
+
+
+class QueryShape:
+    """All executed queries with the same normalized SQL."""
+
+    def __init__(self, sql: str, stack):
+        self.sql = sql
+        self.stack = stack
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = 0.0
+
+
+class QueryDetector:
+    """
+    Context manager recording all queries grouped by shape.
+
+    The stack of the first query of every shape is kept, to point at the view or
+    serializer that triggered it.
+    """
+
+    def __init__(self, slow_query_ms=None, repeated_query_threshold=None):
+        self.slow_query_ms = slow_query_ms or get_setting("SLOW_QUERY_MS")
+        self.repeated_query_threshold = repeated_query_threshold or get_setting(
+            "REPEATED_QUERY_THRESHOLD"
+        )
+        self.shapes = {}
+        self._stack = ExitStack()
+
+    def __enter__(self):
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self.record))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def count(self):
+        return sum(shape.count for shape in self.shapes.values())
+
+    def record(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            normalized = normalize_sql(sql)
+            shape = self.shapes.get(normalized)
+            if shape is None:
+                shape = self.shapes[normalized] = QueryShape(normalized, get_stack())
+            shape.count += 1
+            shape.duration += duration
+            shape.slowest = max(shape.slowest, duration)
+
+    def problems(self):
+        """Return descriptions of repeated and slow queries with their stacks."""
+        problems = []
+        for shape in self.shapes.values():
+            issues = []
+            if shape.count >= self.repeated_query_threshold:
+                issues.append(f"executed {shape.count} times")
+            if shape.slowest >= self.slow_query_ms:
+                issues.append(f"slowest took {shape.slowest:.1f}ms")
+            if issues:
+                problems.append(
+                    f"Query {', '.join(issues)}: {shape.sql}\n  "
+                    + "\n  ".join(reversed(shape.stack))
+                )
+        return problems
+
+    def report(self):
+        """Return all query shapes, most executed first."""
+        return "\n".join(
+            f"{shape.count}x {shape.duration:.1f}ms: {shape.sql}"
+            for shape in sorted(self.shapes.values(), key=lambda shape: -shape.count)
+        )
+
+
+class query_budget(QueryDetector):
+    """
+    Context manager failing when more than max_queries queries are executed.
+
+    Used in tests to keep endpoints within their query budget:
+
+        with query_budget(4):
+            self.client.get("/api/orders")
+    """
+
+    def __init__(self, max_queries: int, **kwargs):
+        super().__init__(**kwargs)
+        self.max_queries = max_queries
+
+    def __exit__(self, exc_type, *exc_info):
+        super().__exit__(exc_type, *exc_info)
+        if exc_type is None and self.count > self.max_queries:
+            raise QueryProblemsDetected(
+                f"{self.count} queries executed, budget is {self.max_queries}:\n"
+                + self.report()
+            )
+
+
+class QueryDetectorMiddleware:
+    """
+    Report repeated and slow queries of every request.
+
+    Enabled by QUERY_DETECTOR["ENABLED"] in settings. Problems are logged, or
+    raised if QUERY_DETECTOR["RAISE"] is set.
+    """
+
+    def __init__(self, get_response):
+        if not get_setting("ENABLED"):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryDetector() as detector:
+            response = self.get_response(request)
+
+        problems = detector.problems()
+        if problems:
+            message = f"{request.method} {request.path}: " + "\n".join(problems)
+            if get_setting("RAISE"):
+                raise QueryProblemsDetected(message)
+            logger.warning(message)
+        return response
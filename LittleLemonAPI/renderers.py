@@ -0,0 +1,124 @@
+import datetime
+import decimal
+import uuid
+
+from django.utils.duration import duration_iso_string
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+from .metrics import render_prometheus
+
+# Binary formats are optional, and only configured if their package is installed.
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Renders a LittleLemonAPI.metrics snapshot in the Prometheus text format."""
+
+    media_type = "text/plain"
+    format = "prometheus"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if "routes" not in data:
+            # Error responses, such as for unauthorized requests.
+            return str(data.get("message", data))
+        return render_prometheus(data)
+
+
+def encode_value(value):
+    """
+    Encode values without a binary representation as the JSON renderer does.
+
+    Decimals, such as prices and totals, are encoded as strings to keep their
+    precision, and dates and times as ISO 8601 strings.
+    """
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return duration_iso_string(value)
+    if isinstance(value, (uuid.UUID, Promise)):
+        return str(value)
+    if isinstance(value, (tuple, set, frozenset)):
+        return list(value)
+    raise TypeError(f"Can't encode {type(value).__name__}")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders data as MessagePack, requires the msgpack package."""
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encode_value)
+
+
+class MessagePackParser(BaseParser):
+    """Parses MessagePack request bodies, requires the msgpack package."""
+
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read())
+        except (ValueError, msgpack.UnpackException) as error:
+            raise ParseError(f"MessagePack parse error - {error}")
+
+
+def encode_cbor_value(encoder, value):
+    encoder.encode(encode_value(value))
+
+
+# Encode decimals and dates as the JSON renderer does, instead of as CBOR tags
+# few clients decode.
+CBOR_ENCODERS = {
+    decimal.Decimal: encode_cbor_value,
+    datetime.datetime: encode_cbor_value,
+    datetime.date: encode_cbor_value,
+    datetime.time: encode_cbor_value,
+    datetime.timedelta: encode_cbor_value,
+    uuid.UUID: encode_cbor_value,
+    Promise: encode_cbor_value,
+}
+
+
+class CBORRenderer(BaseRenderer):
+    """Renders data as CBOR, requires the cbor2 package."""
+
+    media_type = "application/cbor"
+    format = "cbor"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return cbor2.dumps(data, encoders=CBOR_ENCODERS)
+
+
+class CBORParser(BaseParser):
+    """Parses CBOR request bodies, requires the cbor2 package."""
+
+    media_type = "application/cbor"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return cbor2.loads(stream.read())
+        except (ValueError, cbor2.CBORDecodeError) as error:
+            raise ParseError(f"CBOR parse error - {error}")
@@ -0,0 +1,296 @@
+import itertools
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import pagination
+from .models import Category, MenuItem, MenuItemPrice, Cart, Order, OrderItem
+
+SEED_USERNAME_PREFIX = "seed-user-"
+SEED_PASSWORD = "seed-password"
+
+# Relative frequency of quantities 1, 2, 3, and 4 of an item in a cart or order.
+QUANTITY_WEIGHTS = [70, 20, 7, 3]
+
+ORDER_FIELDS = ["id", "user", "delivery_crew", "status", "total", "date"]
+ORDER_ITEM_FIELDS = ["order", "menuitem", "quantity", "unit_price", "price"]
+
+
+def insert_rows(model, fields, rows):
+    """
+    Insert rows of values of model fields with one executemany, bypassing the ORM.
+
+    Building model instances and compiling bulk_create statements take most of
+    the time of seeding large tables, so orders and order items are written this
+    way. Values must already be in a form the database driver accepts.
+    """
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(
+        quote_name(model._meta.get_field(name).column) for name in fields
+    )
+    placeholders = ", ".join(["%s"] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {quote_name(model._meta.db_table)} ({columns}) "
+            f"VALUES ({placeholders})",
+            rows,
+        )
+
+
+def batched(iterable, batch_size: int):
+    """Yield lists of at most batch_size items from an iterable."""
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+def zipf_cum_weights(count: int, exponent: float = 1.1):
+    """
+    Return cumulative weights of a Zipf distribution over count ranks.
+
+    Used to make a few menu items and customers account for most orders.
+    """
+    return list(
+        itertools.accumulate(1 / rank**exponent for rank in range(1, count + 1))
+    )
+
+
+class Seeder:
+    """
+    Generates synthetic users, menu, carts, and orders.
+
+    Rows are written in batches of batch_size, each batch in its own
+    transaction, so memory use is bounded by the batch size. Orders and order
+    items are inserted without the ORM, see insert_rows. Data is deterministic
+    for a given random_seed.
+    """
+
+    def __init__(self, batch_size: int = 1000, random_seed: int = 0, log=None):
+        self.batch_size = batch_size
+        self.random = random.Random(random_seed)
+        self.log = log or (lambda message: None)
+        self.customer_ids = []
+        self.delivery_crew_ids = []
+        self.menuitem_ids = []
+        self.prices = {}
+
+    def random_price(self):
+        """Return a log-normally distributed price with a median around 12."""
+        price = min(99.99, max(0.5, self.random.lognormvariate(2.5, 0.5)))
+        return Decimal(str(round(price, 2)))
+
+    def seed_users(self, count: int):
+        """
+        Create users named by SEED_USERNAME_PREFIX and their index.
+
+        One percent of the users are managers and five percent are delivery crew,
+        at least one of each, and the rest are customers. All users share one
+        precomputed password hash.
+        """
+        password = make_password(SEED_PASSWORD)
+        users = (
+            User(username=f"{SEED_USERNAME_PREFIX}{index}", password=password)
+            for index in range(count)
+        )
+        for batch in batched(users, self.batch_size):
+            User.objects.bulk_create(batch)
+        self.log(f"Created {count} users")
+
+        user_ids = list(
+            User.objects.filter(username__startswith=SEED_USERNAME_PREFIX)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        managers_count = max(1, count // 100)
+        delivery_crew_count = max(1, count // 20)
+        manager_ids = user_ids[:managers_count]
+        self.delivery_crew_ids = user_ids[
+            managers_count : managers_count + delivery_crew_count
+        ]
+        self.customer_ids = user_ids[managers_count + delivery_crew_count :] or user_ids
+
+        manager_group, _ = Group.objects.get_or_create(name="Manager")
+        delivery_crew_group, _ = Group.objects.get_or_create(name="Delivery crew")
+        Membership = User.groups.through
+        memberships = itertools.chain(
+            (Membership(user_id=pk, group=manager_group) for pk in manager_ids),
+            (
+                Membership(user_id=pk, group=delivery_crew_group)
+                for pk in self.delivery_crew_ids
+            ),
+        )
+        for batch in batched(memberships, self.batch_size):
+            Membership.objects.bulk_create(batch)
+
+    def seed_menu(self, categories: int, menu_items: int):
+        """
+        Create categories and menu items spread evenly across them.
+
+        Prices are log-normally distributed and one in ten items is featured.
+        """
+        category_objs = Category.objects.bulk_create(
+            [
+                Category(slug=f"seed-category-{index}", title=f"Seed category {index}")
+                for index in range(categories)
+            ]
+        )
+
+        menu_item_objs = (
+            MenuItem(
+                title=f"Seed item {index}",
+                price=self.random_price(),
+                featured=self.random.random() < 0.1,
+                category=category_objs[index % categories],
+            )
+            for index in range(menu_items)
+        )
+        for batch in batched(menu_item_objs, self.batch_size):
+            with transaction.atomic():
+                MenuItem.objects.bulk_create(batch)
+                # Bulk creation skips MenuItem.save, so create price versions here.
+                price_versions = MenuItemPrice.objects.bulk_create(
+                    [MenuItemPrice(menuitem=item, price=item.price) for item in batch]
+                )
+                for item, price_version in zip(batch, price_versions):
+                    item.price_version = price_version
+                MenuItem.objects.bulk_update(batch, ["price_version"])
+            for item in batch:
+                self.menuitem_ids.append(item.pk)
+                self.prices[item.pk] = item.price
+        self.log(f"Created {categories} categories and {menu_items} menu items")
+
+    def sample_lines(self, max_items: int, cum_weights):
+        """Return distinct (menuitem_id, quantity) pairs weighted by popularity."""
+        count = self.random.choices(
+            range(1, max_items + 1), weights=range(max_items, 0, -1)
+        )[0]
+        menuitem_ids = self.random.choices(
+            self.menuitem_ids, cum_weights=cum_weights, k=count
+        )
+        return [
+            (pk, self.random.choices(range(1, 5), weights=QUANTITY_WEIGHTS)[0])
+            for pk in dict.fromkeys(menuitem_ids)
+        ]
+
+    def seed_carts(self, carts: int, max_items: int):
+        """Create carts with up to max_items lines for distinct customers."""
+        cum_weights = zipf_cum_weights(len(self.menuitem_ids))
+        price_versions = dict(
+            MenuItem.objects.filter(pk__in=self.menuitem_ids).values_list(
+                "pk", "price_version"
+            )
+        )
+        customer_ids = self.random.sample(
+            self.customer_ids, min(carts, len(self.customer_ids))
+        )
+        cart_objs = (
+            Cart(
+                user_id=customer_id,
+                menuitem_id=menuitem_id,
+                quantity=quantity,
+                unit_price=self.prices[menuitem_id],
+                price_version_id=price_versions[menuitem_id],
+            )
+            for customer_id in customer_ids
+            for menuitem_id, quantity in self.sample_lines(max_items, cum_weights)
+        )
+        for batch in batched(cart_objs, self.batch_size):
+            Cart.objects.bulk_create(batch)
+        self.log(f"Created {len(customer_ids)} carts")
+
+    def seed_orders(self, orders: int, max_items: int, days: int):
+        """
+        Create orders with up to max_items distinct menu items each.
+
+        Orders are spread evenly over the last days days in chronological order,
+        and popular customers and menu items follow a Zipf distribution. Orders
+        older than a day are delivered by a delivery crew, and half of the newer
+        orders are assigned.
+        """
+        menuitem_weights = zipf_cum_weights(len(self.menuitem_ids))
+        customer_weights = zipf_cum_weights(len(self.customer_ids))
+        today = date.today()
+        order_dates = (
+            today - timedelta(days=days - 1 - index * days // orders)
+            for index in range(orders)
+        )
+
+        # Ids are assigned here, so order items can be inserted without reading
+        # back the ids of inserted orders.
+        next_order_id = (Order.objects.aggregate(Max("pk"))["pk__max"] or 0) + 1
+        created = 0
+        for batch_dates in batched(order_dates, self.batch_size):
+            order_rows = []
+            order_item_rows = []
+            for order_id, order_date in enumerate(batch_dates, next_order_id):
+                lines = self.sample_lines(max_items, menuitem_weights)
+                delivered = order_date < today - timedelta(days=1)
+                assigned = delivered or self.random.random() < 0.5
+                order_rows.append(
+                    (
+                        order_id,
+                        self.random.choices(
+                            self.customer_ids, cum_weights=customer_weights
+                        )[0],
+                        (
+                            self.random.choice(self.delivery_crew_ids)
+                            if assigned
+                            else None
+                        ),
+                        delivered,
+                        sum(self.prices[pk] * quantity for pk, quantity in lines),
+                        order_date,
+                    )
+                )
+                order_item_rows.extend(
+                    (
+                        order_id,
+                        menuitem_id,
+                        quantity,
+                        self.prices[menuitem_id],
+                        self.prices[menuitem_id] * quantity,
+                    )
+                    for menuitem_id, quantity in lines
+                )
+            next_order_id += len(batch_dates)
+
+            with transaction.atomic():
+                insert_rows(Order, ORDER_FIELDS, order_rows)
+                insert_rows(OrderItem, ORDER_ITEM_FIELDS, order_item_rows)
+            created += len(order_rows)
+            self.log(f"Created {created} orders")
+
+        # Move the id sequence past the assigned ids, on databases using them.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Order]):
+                cursor.execute(sql)
+
+
+def seed(
+    categories: int = 5,
+    menu_items: int = 50,
+    users: int = 20,
+    carts: int = 5,
+    orders: int = 100,
+    max_items_per_order: int = 3,
+    days: int = 365,
+    batch_size: int = 1000,
+    random_seed: int = 0,
+    log=None,
+):
+    """Seed the database with deterministic synthetic data."""
+    seeder = Seeder(batch_size=batch_size, random_seed=random_seed, log=log)
+    seeder.seed_users(users)
+    seeder.seed_menu(categories, menu_items)
+    seeder.seed_carts(carts, max_items_per_order)
+    seeder.seed_orders(orders, max_items_per_order, days)
+    # Rows were bulk inserted without signals.
+    pagination.invalidate_counts(
+        User, User.groups.through, Category, MenuItem, Cart, Order, OrderItem
+    )
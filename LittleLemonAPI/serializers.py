@@ -1,7 +1,15 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import (
+    Category,
+    MenuItem,
+    Cart,
+    Order,
+    OrderItem,
+    ArchivedOrderItem,
+    PrepTask,
+)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -21,7 +29,18 @@ class MenuItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = MenuItem
-        fields = ["id", "title", "price", "featured", "category_id", "category"]
+        fields = [
+            "id",
+            "title",
+            "price",
+            "featured",
+            "stock",
+            "sold_out",
+            "prep_time",
+            "category_id",
+            "category",
+        ]
+        read_only_fields = ["sold_out"]
         depth = 1
 
 
@@ -91,3 +110,73 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
     def get_total_price(self, order_item: OrderItem):
         return order_item.unit_price * order_item.quantity
+
+
+class ArchivedOrderItemSerializer(OrderItemSerializer):
+    class Meta(OrderItemSerializer.Meta):
+        model = ArchivedOrderItem
+
+
+class OrderBulkUpdateSerializer(serializers.Serializer):
+    """A single order update of a batch of order updates."""
+
+    order_id = serializers.IntegerField()
+    status = serializers.BooleanField(required=False)
+    delivery_crew = serializers.IntegerField(required=False, allow_null=True)
+
+
+class UserBatchSerializer(serializers.Serializer):
+    """A batch of users identified by either usernames or ids."""
+
+    usernames = serializers.ListField(
+        child=serializers.CharField(), required=False, max_length=1000
+    )
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, max_length=1000
+    )
+
+    def validate(self, attrs):
+        if ("usernames" in attrs) == ("ids" in attrs):
+            raise serializers.ValidationError("Provide either usernames or ids")
+        return attrs
+
+
+class PrepTaskSerializer(serializers.ModelSerializer):
+    menuitem_title = serializers.CharField(source="menuitem.title", read_only=True)
+
+    class Meta:
+        model = PrepTask
+        fields = [
+            "id",
+            "order_id",
+            "order_item_id",
+            "menuitem_id",
+            "menuitem_title",
+            "quantity",
+            "prep_time",
+            "status",
+            "start_by",
+            "station",
+            "claimed",
+            "completed",
+        ]
+
+
+class PrepTaskClaimSerializer(serializers.Serializer):
+    """The kitchen station claiming, or completing, a prep task."""
+
+    station = serializers.CharField(max_length=50)
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """A single request of a batch of requests."""
+
+    method = serializers.ChoiceField(["GET", "POST", "PUT", "PATCH", "DELETE"])
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, min_length=1, max_length=20)
+    # Run GET requests concurrently, only if all requests are GET requests.
+    parallel = serializers.BooleanField(default=False)
@@ -0,0 +1,125 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+
+from . import jobs
+from .models import Category, Job, MenuItem
+from .serializers import CategorySerializer, MenuItemSerializer
+
+FORMATS = ("json", "xml")
+# Previous versions kept for requests still reading them.
+KEEP_VERSIONS = 3
+
+
+def get_renderers():
+    # Imported on publishing, so workers don't import the XML renderer on startup.
+    from rest_framework_xml.renderers import XMLRenderer
+
+    return {"json": JSONRenderer(), "xml": XMLRenderer()}
+
+
+def get_directory():
+    return Path(
+        getattr(settings, "MENU_SNAPSHOT_DIR", settings.BASE_DIR / "menu_snapshots")
+    )
+
+
+def write_file(path: Path, content: bytes):
+    """Write a file atomically, so readers never see a partial file."""
+    # A unique temporary file, so concurrent publishes don't write to one file.
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as temporary_file:
+        temporary_file.write(content)
+    try:
+        os.replace(temporary_file.name, path)
+    except OSError:
+        os.unlink(temporary_file.name)
+        raise
+
+
+def get_current_version():
+    """Return the version of the published menu snapshot, or None."""
+    try:
+        return (get_directory() / "CURRENT").read_text()
+    except FileNotFoundError:
+        return None
+
+
+def get_path(version: str, format: str, compressed: bool = False):
+    suffix = ".gz" if compressed else ""
+    return get_directory() / f"menu-{version}.{format}{suffix}"
+
+
+def publish():
+    """
+    Render the full menu to versioned JSON and XML files, plain and gzipped,
+    and point CURRENT at them.
+
+    Versions are named by publishing time and a hash of the menu, so unchanged
+    menus are not rewritten. Returns the published version.
+    """
+    menu_items = MenuItemSerializer(
+        MenuItem.objects.select_related("category").order_by("pk"), many=True
+    ).data
+    # Stock changes with every order, only publish whether items are sold out.
+    for menu_item in menu_items:
+        del menu_item["stock"]
+    data = {
+        "categories": CategorySerializer(Category.objects.all(), many=True).data,
+        "menu_items": menu_items,
+    }
+    rendered = {}
+    for format, renderer in get_renderers().items():
+        content = renderer.render(data)
+        # The XML renderer returns text.
+        rendered[format] = content.encode() if isinstance(content, str) else content
+    digest = hashlib.sha256(rendered["json"]).hexdigest()[:16]
+    current_version = get_current_version()
+    if current_version and current_version.endswith(digest):
+        return current_version
+    version = f"{time.time_ns():016x}-{digest}"
+
+    directory = get_directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    for format, content in rendered.items():
+        write_file(get_path(version, format), content)
+        write_file(get_path(version, format, True), gzip.compress(content, 9))
+    write_file(directory / "CURRENT", version.encode())
+
+    # Delete the oldest versions.
+    versions = sorted(directory.glob("menu-*.json"))
+    for path in versions[:-KEEP_VERSIONS]:
+        old_version = path.name[len("menu-") : -len(".json")]
+        for format in FORMATS:
+            get_path(old_version, format).unlink(missing_ok=True)
+            get_path(old_version, format, True).unlink(missing_ok=True)
+    return version
+
+
+def request_publish():
+    """
+    Enqueue a menu.publish job, unless one is pending already.
+
+    Called in the transaction changing the menu, so the job runs once that is
+    committed, and saves in one transaction enqueue a single job. Pending jobs
+    are run together by the runjobs command, publishing the menu once.
+    """
+    if not Job.objects.filter(name="menu.publish", status=Job.PENDING).exists():
+        jobs.enqueue("menu.publish", {})
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def publish_on_change(**kwargs):
+    request_publish()
@@ -0,0 +1,39 @@
+import logging
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import kitchen, snapshots
+from .jobs import register
+
+logger = logging.getLogger(__name__)
+
+
+@register("order.created", batch=True)
+def order_created(payloads):
+    """Post-checkout work for new orders, run off the request path."""
+    logger.info("Orders created: %s", [payload["order_id"] for payload in payloads])
+    # Queue the items for preparation by when they were ordered, so orders of
+    # delayed or retried jobs keep their place in the kitchen. Jobs enqueued
+    # without the time are queued as ordered now.
+    now = timezone.now()
+    kitchen.create_tasks(
+        {
+            payload["order_id"]: (
+                parse_datetime(payload["ordered"]) if "ordered" in payload else now
+            )
+            for payload in payloads
+        }
+    )
+
+
+@register("order.updated", batch=True)
+def order_updated(payloads):
+    """Post-update work for changed orders, run off the request path."""
+    logger.info("Orders updated: %s", [payload["order_id"] for payload in payloads])
+
+
+@register("menu.publish", batch=True)
+def menu_publish(payloads):
+    """Publish the menu snapshot once for all menu changes since the last run."""
+    snapshots.publish()
@@ -1,3 +1,1749 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import marshal
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+
+from LittleLemon import db_routers
+
+from . import (
+    archive,
+    pagination,
+    profiling,
+    carts,
+    jobs,
+    kitchen,
+    metrics,
+    seeding,
+    snapshots,
+    urls,
+    tasks,
+    views,
+    warmup,
+    webhooks,
+)
+from .renderers import cbor2, msgpack
+from .middleware import CompressionMiddleware, ReplicaMiddleware
+from .admin import EstimatedCountPaginator
+from .management.commands import importprofile
+from .benchmark import (
+    run_benchmark,
+    compare_to_baseline,
+    get_scenarios,
+    percentile,
+    unthrottled,
+)
+from .models import (
+    Category,
+    MenuItem,
+    Cart,
+    Order,
+    OrderItem,
+    ArchivedOrder,
+    ArchivedOrderItem,
+    PrepTask,
+    Job,
+    OrderEvent,
+    WebhookSubscriber,
+)
+from .querydetector import (
+    normalize_sql,
+    query_budget,
+    QueryDetector,
+    QueryProblemsDetected,
+)
+
+
+def seed_small():
+    seeding.seed(categories=2, menu_items=6, users=5, orders=4)
+
+
+def use_temporary_snapshot_dir(test):
+    """Publish menu snapshots to a directory deleted after the test."""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    settings_override = override_settings(MENU_SNAPSHOT_DIR=directory.name)
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+
+
+class SeedingTest(TestCase):
+    def get_seeded_rows(self):
+        return {
+            "users": list(
+                User.objects.order_by("pk").values_list("username", "groups__name")
+            ),
+            "menuitems": list(
+                MenuItem.objects.order_by("pk").values_list(
+                    "title", "price", "featured", "category__title"
+                )
+            ),
+            "carts": list(
+                Cart.objects.order_by("pk").values_list(
+                    "user__username", "menuitem__title", "quantity"
+                )
+            ),
+            "orders": list(
+                Order.objects.order_by("pk").values_list(
+                    "user__username",
+                    "delivery_crew__username",
+                    "status",
+                    "total",
+                    "date",
+                )
+            ),
+            "order_items": list(
+                OrderItem.objects.order_by("order_id", "menuitem__title").values_list(
+                    "menuitem__title", "quantity", "unit_price", "price"
+                )
+            ),
+        }
+
+    def delete_seeded_rows(self):
+        Order.objects.all().delete()
+        Cart.objects.all().delete()
+        MenuItem.objects.all().delete()
+        Category.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_same_seed_creates_same_rows(self):
+        seeding.seed(users=10, orders=20, random_seed=1)
+        rows = self.get_seeded_rows()
+        self.assertEqual(len(rows["orders"]), 20)
+        self.assertEqual(
+            sum(price for *_, price in rows["order_items"]),
+            sum(total for *_, total, _ in rows["orders"]),
+        )
+
+        self.delete_seeded_rows()
+        seeding.seed(users=10, orders=20, random_seed=1)
+        self.assertEqual(self.get_seeded_rows(), rows)
+
+        self.delete_seeded_rows()
+        seeding.seed(users=10, orders=20, random_seed=2)
+        self.assertNotEqual(self.get_seeded_rows()["order_items"], rows["order_items"])
+
+    def test_seed_command(self):
+        call_command(
+            "seed",
+            categories=2,
+            menu_items=5,
+            users=20,
+            carts=3,
+            orders=10,
+            max_items_per_order=2,
+            days=5,
+            batch_size=4,
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual(MenuItem.objects.count(), 5)
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Cart.objects.values("user").distinct().count(), 3)
+        self.assertEqual(Order.objects.count(), 10)
+        dates = Order.objects.values_list("date", flat=True)
+        self.assertLessEqual(timezone.localdate() - min(dates), timedelta(days=4))
+        # New orders get ids after the seeded ones.
+        self.assertGreater(
+            Order.objects.create(user=User.objects.first(), total=1).pk, 10
+        )
+
+        with self.assertRaises(CommandError):
+            call_command("seed", orders=1, stdout=io.StringIO())
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_small()
+
+    def setUp(self):
+        use_temporary_snapshot_dir(self)
+
+    def test_scenarios_cover_every_route(self):
+        routes = {
+            re.sub(r"<[^>]+>", "{}", str(pattern.pattern))
+            for pattern in urls.urlpatterns
+        }
+        scenario_routes = {
+            re.sub(r"\{[^}]+\}", "{}", scenario.path.split("?")[0])
+            for scenario in get_scenarios()
+        }
+        self.assertEqual(routes - scenario_routes, set())
+
+    def test_benchmark_report(self):
+        report = run_benchmark(iterations=2, concurrency=0)
+        for name, result in report["endpoints"].items():
+            self.assertEqual(result["errors"], 0, name)
+            self.assertEqual(result["count"], 2)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["queries"], 0)
+
+    def test_benchmark_leaves_data_unchanged(self):
+        def get_data():
+            return [
+                list(model.objects.order_by("pk").values())
+                for model in (Category, MenuItem, Cart, Order, OrderItem, PrepTask)
+            ]
+
+        run_benchmark(iterations=1, concurrency=0)  # Creates the benchmark users.
+        data = get_data()
+        run_benchmark(iterations=2, concurrency=0)
+        self.assertEqual(get_data(), data)
+
+    def test_compare_to_baseline(self):
+        report = run_benchmark(iterations=2, concurrency=0)
+        self.assertEqual(compare_to_baseline(report, report), [])
+
+        baseline = {"endpoints": {}}
+        for name, result in report["endpoints"].items():
+            baseline["endpoints"][name] = dict(result, queries=result["queries"] - 1)
+        self.assertEqual(
+            len(compare_to_baseline(report, baseline)), len(report["endpoints"])
+        )
+
+    def test_percentile_is_nearest_rank(self):
+        self.assertEqual(percentile([1, 2], 50), 1)
+        self.assertEqual(percentile([1, 2], 51), 2)
+        self.assertEqual(percentile(list(range(1, 11)), 90), 9)
+        self.assertEqual(percentile(list(range(1, 11)), 99), 10)
+        self.assertEqual(percentile([5], 0), 5)
+
+    def test_compression_report(self):
+        report = run_benchmark(iterations=1, concurrency=0, compression=True)
+        for result in report["compression"]:
+            self.assertGreater(result["ratio"], 1)
+
+
+class BenchmarkLoadTest(TransactionTestCase):
+    def setUp(self):
+        use_temporary_snapshot_dir(self)
+        seed_small()
+
+    def test_concurrent_load(self):
+        report = run_benchmark(iterations=1, concurrency=2, load_requests=20)
+        self.assertEqual(report["load"]["count"], 20)
+        self.assertEqual(report["load"]["errors"], 0)
+
+
+class PerformanceMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_small()
+        cls.manager = User.objects.filter(groups__name="Manager").first()
+
+    def setUp(self):
+        # Reset throttling history.
+        cache.clear()
+        metrics.reset()
+
+    def test_server_timing_header(self):
+        response = self.client.get("/api/menu-items")
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+    def test_metrics_aggregated_per_route(self):
+        self.client.get("/api/menu-items/1")
+        self.client.get("/api/menu-items/2")
+        self.client.force_login(self.manager)
+
+        response = self.client.get("/api/metrics")
+        self.assertEqual(response.status_code, 200)
+        route = next(
+            route
+            for route in response.json()["routes"]
+            if route["route"] == "api/menu-items/<int:pk>"
+        )
+        self.assertEqual(route["total_ms"]["count"], 2)
+        self.assertGreater(route["queries"], 0)
+
+        response = self.client.get("/api/metrics?format=prometheus")
+        self.assertIn(
+            'littlelemon_request_total_milliseconds_count{method="GET",'
+            'route="api/menu-items/<int:pk>"} 2',
+            response.content.decode(),
+        )
+
+    def test_metrics_manager_only(self):
+        self.client.force_login(User.objects.create_user("customer"))
+        self.assertEqual(self.client.get("/api/metrics").status_code, 403)
+
+
+class QueryDetectorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_small()
+        cls.manager = User.objects.filter(groups__name="Manager").first()
+
+    def setUp(self):
+        # Reset throttling history.
+        cache.clear()
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = %s AND b IN (%s, %s) LIMIT 21"),
+            "SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?",
+        )
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 'x' AND b IN (1, 2)"),
+            normalize_sql("SELECT * FROM t WHERE a = 'y' AND b IN (3, 4, 5)"),
+        )
+
+    def test_query_budget(self):
+        with self.assertRaises(QueryProblemsDetected):
+            with query_budget(1):
+                list(User.objects.all())
+                list(User.objects.all())
+
+    def test_list_endpoints_query_budget(self):
+        self.client.force_login(self.manager)
+        with query_budget(4):
+            self.client.get("/api/menu-items")
+        with query_budget(5):
+            self.client.get("/api/orders")
+        with query_budget(7):
+            self.client.get("/api/orders/1")
+
+    def test_detects_repeated_queries(self):
+        with QueryDetector(repeated_query_threshold=2) as detector:
+            for menuitem in MenuItem.objects.all()[:2]:
+                menuitem.category
+        problems = detector.problems()
+        self.assertEqual(len(problems), 1)
+        self.assertIn("executed 2 times", problems[0])
+        self.assertIn("tests.py", problems[0])
+
+    @override_settings(
+        QUERY_DETECTOR={"ENABLED": True, "RAISE": True, "REPEATED_QUERY_THRESHOLD": 1}
+    )
+    def test_middleware_raises(self):
+        with self.assertRaises(QueryProblemsDetected):
+            self.client.get("/api/menu-items")
+
+
+class AdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_small()
+        cls.superuser = User.objects.create_superuser("admin")
+
+    def test_changelists_query_budget(self):
+        self.client.force_login(self.superuser)
+        for model in ["menuitem", "cart", "order", "orderitem"]:
+            with query_budget(7):
+                response = self.client.get(f"/admin/LittleLemonAPI/{model}/")
+            self.assertEqual(response.status_code, 200)
+
+    def test_count_is_exact_after_deletes(self):
+        Order.objects.filter(pk__lt=Order.objects.order_by("-pk")[0].pk).delete()
+        paginator = EstimatedCountPaginator(Order.objects.order_by("pk"), 10)
+        paginator.ESTIMATE_THRESHOLD = 0
+        self.assertEqual(paginator.count, 1)
+
+
+def add_to_cart(user, menuitem, quantity=1):
+    return Cart.objects.create(
+        user=user,
+        menuitem=menuitem,
+        quantity=quantity,
+        unit_price=menuitem.price,
+        price_version=menuitem.price_version,
+    )
+
+
+class PriceVersionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(slug="mains", title="Mains")
+        cls.menuitem = MenuItem.objects.create(
+            title="Soup", price="5.00", featured=False, category=category
+        )
+        cls.user = User.objects.create_user("customer")
+
+    def setUp(self):
+        # Reset throttling history.
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_price_changes_are_versioned(self):
+        menuitem = MenuItem.objects.get(pk=self.menuitem.pk)
+        self.assertEqual(menuitem.price_version.price, Decimal("5.00"))
+
+        menuitem.featured = True
+        menuitem.save()
+        self.assertEqual(menuitem.price_versions.count(), 1)
+
+        menuitem.price = "6.00"
+        menuitem.save()
+        menuitem.refresh_from_db()
+        self.assertEqual(menuitem.price_versions.count(), 2)
+        self.assertEqual(menuitem.price_version.price, Decimal("6.00"))
+
+    def test_queryset_price_updates_are_versioned(self):
+        MenuItem.objects.filter(pk=self.menuitem.pk).update(price="7.00")
+        menuitem = MenuItem.objects.get(pk=self.menuitem.pk)
+        self.assertEqual(menuitem.price_versions.count(), 2)
+        self.assertEqual(menuitem.price_version.price, Decimal("7.00"))
+
+    def test_checkout_revalidates_stale_cart_prices(self):
+        cart_item = add_to_cart(self.user, self.menuitem)
+        menuitem = MenuItem.objects.get(pk=self.menuitem.pk)
+        menuitem.price = "6.00"
+        menuitem.save()
+
+        self.assertEqual(self.client.post("/api/orders").status_code, 409)
+        cart_item.refresh_from_db()
+        self.assertEqual(cart_item.unit_price, Decimal("6.00"))
+        self.assertEqual(cart_item.price_version_id, menuitem.price_version_id)
+        self.assertFalse(Order.objects.exists())
+
+        self.assertEqual(self.client.post("/api/orders").status_code, 201)
+        self.assertEqual(Order.objects.get().total, Decimal("6.00"))
+
+    def test_checkout_revalidates_in_the_order_transaction(self):
+        add_to_cart(self.user, self.menuitem)
+        outer_depth = len(connection.atomic_blocks)
+        cart_queries = []
+
+        def record(execute, sql, params, many, context):
+            if '"LittleLemonAPI_cart"' in sql:
+                cart_queries.append(len(connection.atomic_blocks) > outer_depth)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            self.assertEqual(self.client.post("/api/orders").status_code, 201)
+        # Revalidated, read and deleted with the order in one transaction.
+        self.assertGreaterEqual(len(cart_queries), 3)
+        self.assertTrue(all(cart_queries))
+
+
+class StockTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(slug="mains", title="Mains")
+        cls.menuitem = MenuItem.objects.create(
+            title="Soup", price="5.00", featured=False, category=category, stock=3
+        )
+        cls.untracked_menuitem = MenuItem.objects.create(
+            title="Bread", price="1.00", featured=False, category=category
+        )
+        cls.user = User.objects.create_user("customer")
+
+    def setUp(self):
+        # Reset throttling history.
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_checkout_decrements_stock(self):
+        add_to_cart(self.user, self.menuitem, 2)
+        add_to_cart(self.user, self.untracked_menuitem, 5)
+        self.assertEqual(self.client.post("/api/orders").status_code, 201)
+
+        self.menuitem.refresh_from_db()
+        self.untracked_menuitem.refresh_from_db()
+        self.assertEqual(self.menuitem.stock, 1)
+        self.assertFalse(self.menuitem.sold_out)
+        self.assertIsNone(self.untracked_menuitem.stock)
+
+    def test_checkout_sells_out(self):
+        add_to_cart(self.user, self.menuitem, 3)
+        self.assertEqual(self.client.post("/api/orders").status_code, 201)
+
+        self.menuitem.refresh_from_db()
+        self.assertEqual(self.menuitem.stock, 0)
+        self.assertTrue(self.menuitem.sold_out)
+        response = self.client.get("/api/menu-items?sold_out=true")
+        self.assertEqual(response.json()["results"][0]["title"], "Soup")
+        response = self.client.post(
+            "/api/cart/menu-items", {"menuitem": "Soup", "quantity": 1}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_checkout_insufficient_stock(self):
+        add_to_cart(self.user, self.menuitem, 4)
+        add_to_cart(self.user, self.untracked_menuitem, 1)
+        self.assertEqual(self.client.post("/api/orders").status_code, 409)
+
+        # Nothing is written when any item is short.
+        self.menuitem.refresh_from_db()
+        self.assertEqual(self.menuitem.stock, 3)
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 2)
+
+
+class StockConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        use_temporary_snapshot_dir(self)
+
+    def test_parallel_checkouts_do_not_oversell(self):
+        stock = 5
+        category = Category.objects.create(slug="mains", title="Mains")
+        menuitem = MenuItem.objects.create(
+            title="Soup", price="5.00", featured=False, category=category, stock=stock
+        )
+        clients = []
+        for index in range(20):
+            user = User.objects.create_user(f"customer-{index}")
+            add_to_cart(user, menuitem)
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        statuses = []
+
+        def checkout(client):
+            try:
+                statuses.append(client.post("/api/orders").status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=[c]) for c in clients]
+        with unthrottled():
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        menuitem.refresh_from_db()
+        self.assertEqual(menuitem.stock, 0)
+        self.assertTrue(menuitem.sold_out)
+        self.assertEqual(statuses.count(201), stock)
+        self.assertEqual(statuses.count(409), len(clients) - stock)
+        self.assertEqual(Order.objects.count(), stock)
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        use_temporary_snapshot_dir(self)
+        self.calls = []
+        jobs.register("test.succeed")(self.calls.append)
+        jobs.register("test.batch", batch=True)(self.calls.append)
+        jobs.register("test.fail")(self.fail_job)
+        self.addCleanup(jobs.handlers.pop, "test.succeed")
+        self.addCleanup(jobs.handlers.pop, "test.batch")
+        self.addCleanup(jobs.handlers.pop, "test.fail")
+
+    def fail_job(self, payload):
+        raise ValueError("Failed")
+
+    def test_checkout_enqueues_job(self):
+        category = Category.objects.create(slug="mains", title="Mains")
+        menuitem = MenuItem.objects.create(
+            title="Soup", price="5.00", featured=False, category=category
+        )
+        user = User.objects.create_user("customer")
+        add_to_cart(user, menuitem)
+        self.client.force_login(user)
+        self.client.post("/api/orders")
+
+        order = Order.objects.get()
+        job = Job.objects.get(name="order.created")
+        self.assertEqual(job.payload["order_id"], order.pk)
+        self.assertLessEqual(
+            parse_datetime(job.payload["ordered"]) - job.created, timedelta(seconds=1)
+        )
+
+        call_command("runjobs", once=True)
+        self.assertFalse(Job.objects.exists())
+
+    def test_run_jobs(self):
+        jobs.enqueue("test.succeed", {"number": 1})
+        jobs.enqueue("test.batch", {"number": 2})
+        jobs.enqueue("test.batch", {"number": 3})
+
+        claimed = jobs.claim(10, timedelta(minutes=1))
+        self.assertEqual(jobs.claim(10, timedelta(minutes=1)), [])
+        self.assertEqual(jobs.run(claimed), 3)
+        self.assertEqual(self.calls, [{"number": 1}, [{"number": 2}, {"number": 3}]])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = jobs.enqueue("test.fail", {}, max_attempts=2)
+
+        with self.assertLogs("LittleLemonAPI.jobs", "ERROR"):
+            jobs.run(jobs.claim(10, timedelta(minutes=1)))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("Failed", job.last_error)
+        self.assertEqual(jobs.claim(10, timedelta(minutes=1)), [])
+
+        Job.objects.update(run_after=job.created)
+        with self.assertLogs("LittleLemonAPI.jobs", "ERROR"):
+            jobs.run(jobs.claim(10, timedelta(minutes=1)))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(jobs.claim(10, timedelta(minutes=1)), [])
+
+    def test_unfinished_job_is_reclaimed_after_visibility_timeout(self):
+        jobs.enqueue("test.succeed", {})
+        jobs.claim(10, timedelta(seconds=-1))
+        [job] = jobs.claim(10, timedelta(minutes=1))
+        self.assertEqual(job.attempts, 2)
+
+    def test_unfinished_job_fails_once_out_of_attempts(self):
+        job = jobs.enqueue("test.succeed", {}, max_attempts=2)
+        jobs.claim(10, timedelta(seconds=-1))
+        jobs.claim(10, timedelta(seconds=-1))
+        self.assertEqual(jobs.claim(10, timedelta(minutes=1)), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_reclaimed_job_is_left_to_new_worker(self):
+        jobs.enqueue("test.succeed", {})
+        jobs.enqueue("test.fail", {})
+        stale_claim = jobs.claim(10, timedelta(seconds=-1))
+        new_claim = jobs.claim(10, timedelta(minutes=1))
+
+        with self.assertLogs("LittleLemonAPI.jobs", "ERROR"):
+            jobs.run(stale_claim)
+        self.assertEqual(
+            list(Job.objects.order_by("pk").values_list("lock_token", "status")),
+            [(job.lock_token, Job.RUNNING) for job in new_claim],
+        )
+
+
+class WebhookStubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.received.append((self.path, body))
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(WEBHOOK_SETTLE_SECONDS=0)
+class WebhookTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("customer")
+        cls.order = Order.objects.create(user=cls.user, total="5.00")
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), WebhookStubHandler)
+        self.server.received = []
+        self.server.status = 200
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.pool = webhooks.ConnectionPool()
+        self.addCleanup(self.pool.close)
+
+    def test_order_update_records_event(self):
+        manager = User.objects.create_user("manager", is_superuser=True)
+        self.client.force_login(manager)
+        self.client.patch(
+            f"/api/orders/{self.order.pk}",
+            "status=0",
+            content_type="application/x-www-form-urlencoded",
+        )
+        event = OrderEvent.objects.get()
+        self.assertEqual(event.event, "order.updated")
+        self.assertEqual(event.payload["status"], False)
+
+    def test_deliver_batches_per_subscriber(self):
+        WebhookSubscriber.objects.create(url=f"{self.url}/pos")
+        WebhookSubscriber.objects.create(
+            url=f"{self.url}/kitchen", events=["order.created"]
+        )
+        webhooks.record_order_events("order.created", [self.order])
+        webhooks.record_order_events("order.updated", [self.order])
+
+        self.assertEqual(webhooks.deliver(self.pool), 3)
+        received = dict(self.server.received)
+        self.assertEqual(
+            [event["event"] for event in received["/pos"]["events"]],
+            ["order.created", "order.updated"],
+        )
+        self.assertEqual(
+            [event["event"] for event in received["/kitchen"]["events"]],
+            ["order.created"],
+        )
+        self.assertEqual(webhooks.deliver(self.pool), 0)
+        self.assertEqual(webhooks.prune(), 2)
+
+    def test_failed_delivery_is_retried(self):
+        subscriber = WebhookSubscriber.objects.create(url=self.url)
+        webhooks.record_order_events("order.created", [self.order])
+        self.server.status = 500
+
+        self.assertEqual(webhooks.deliver(self.pool), 0)
+        subscriber.refresh_from_db()
+        self.assertEqual(subscriber.failures, 1)
+        self.assertEqual(subscriber.last_event_id, 0)
+        # Backing off until retry_after.
+        self.assertEqual(webhooks.deliver(self.pool), 0)
+        self.assertEqual(len(self.server.received), 1)
+
+        self.server.status = 200
+        WebhookSubscriber.objects.update(retry_after=None)
+        self.assertEqual(webhooks.deliver(self.pool), 1)
+        subscriber.refresh_from_db()
+        self.assertEqual(subscriber.failures, 0)
+
+    @override_settings(WEBHOOK_SETTLE_SECONDS=60)
+    def test_recent_events_are_held_back(self):
+        subscriber = WebhookSubscriber.objects.create(url=self.url)
+        webhooks.record_order_events("order.created", [self.order])
+        self.assertEqual(webhooks.deliver(self.pool), 0)
+
+        OrderEvent.objects.update(created=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(webhooks.deliver(self.pool), 1)
+        subscriber.refresh_from_db()
+        self.assertEqual(subscriber.last_event_id, OrderEvent.objects.get().pk)
+
+    def test_protocol_errors_fail_only_their_subscriber(self):
+        # Raises http.client.InvalidURL rather than an OSError.
+        broken = WebhookSubscriber.objects.create(url="http://127.0.0.1:port/")
+        WebhookSubscriber.objects.create(url=self.url)
+        webhooks.record_order_events("order.created", [self.order])
+
+        self.assertEqual(webhooks.deliver(self.pool), 1)
+        broken.refresh_from_db()
+        self.assertEqual(broken.failures, 1)
+
+    def test_events_are_kept_for_all_subscribers(self):
+        webhooks.record_order_events("order.created", [self.order])
+        self.assertEqual(webhooks.prune(), 0)
+
+        WebhookSubscriber.objects.create(url=self.url, active=False)
+        WebhookSubscriber.objects.create(url=self.url)
+        webhooks.record_order_events("order.created", [self.order])
+        self.assertEqual(webhooks.deliver(self.pool), 1)
+        # Only the event recorded before anyone subscribed is deleted.
+        self.assertEqual(webhooks.prune(), 1)
+        self.assertEqual(OrderEvent.objects.count(), 1)
+
+
+class BulkOrderUpdateTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user("manager")
+        self.crew = User.objects.create_user("crew")
+        self.other_crew = User.objects.create_user("other-crew")
+        customer = User.objects.create_user("customer")
+        Group.objects.create(name="Manager").user_set.add(self.manager)
+        Group.objects.create(name="Delivery crew").user_set.add(
+            self.crew, self.other_crew
+        )
+        self.orders = [
+            Order.objects.create(user=customer, total="10.00") for _ in range(3)
+        ]
+
+    def post(self, updates):
+        return self.client.post(
+            "/api/orders/batch", {"updates": updates}, content_type="application/json"
+        )
+
+    def test_manager_updates_orders(self):
+        self.client.force_login(self.manager)
+        first, second, third = self.orders
+        with query_budget(12):
+            response = self.post(
+                [
+                    {"order_id": first.pk, "delivery_crew": self.crew.pk},
+                    {"order_id": second.pk, "delivery_crew": self.crew.pk, "status": 1},
+                    {"order_id": third.pk, "delivery_crew": self.manager.pk},
+                    {"order_id": third.pk, "status": True},
+                    {"order_id": 0, "status": True},
+                    {"status": True},
+                ]
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result["status"] for result in response.json()["results"]],
+            [200, 200, 400, 400, 404, 400],
+        )
+        for order in self.orders:
+            order.refresh_from_db()
+        self.assertEqual(first.delivery_crew, self.crew)
+        self.assertFalse(first.status)
+        self.assertTrue(second.status)
+        self.assertIsNone(third.delivery_crew)
+        self.assertEqual(Job.objects.filter(name="order.updated").count(), 2)
+        self.assertEqual(OrderEvent.objects.filter(event="order.updated").count(), 2)
+
+    def test_delivery_crew_updates_status_of_assigned_orders(self):
+        Order.objects.filter(pk=self.orders[0].pk).update(delivery_crew=self.crew)
+        Order.objects.filter(pk=self.orders[1].pk).update(delivery_crew=self.other_crew)
+        self.client.force_login(self.crew)
+        response = self.post(
+            [
+                {"order_id": self.orders[0].pk, "status": True},
+                {"order_id": self.orders[1].pk, "status": True},
+                {"order_id": self.orders[0].pk, "delivery_crew": None},
+            ]
+        )
+
+        self.assertEqual(
+            [result["status"] for result in response.json()["results"]],
+            [200, 401, 400],
+        )
+        self.assertEqual(list(Order.objects.filter(status=True)), [self.orders[0]])
+
+    def test_customer_is_forbidden(self):
+        self.client.force_login(self.orders[0].user)
+        response = self.post([{"order_id": self.orders[0].pk, "status": True}])
+        self.assertEqual(response.status_code, 403)
+
+    def test_too_many_updates(self):
+        self.client.force_login(self.manager)
+        response = self.post([{"order_id": 1}] * 101)
+        self.assertEqual(response.status_code, 400)
+
+
+class GroupUsersBatchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user("manager")
+        Group.objects.create(name="Manager").user_set.add(self.manager)
+        Group.objects.create(name="Delivery crew")
+        self.users = [User.objects.create_user(f"crew-{n}") for n in range(5)]
+        self.client.force_login(self.manager)
+
+    def test_add_and_remove_users(self):
+        with query_budget(8):
+            response = self.client.post(
+                "/api/groups/delivery-crew/users/batch",
+                {"usernames": ["crew-0", "crew-1", "crew-2", "crew-2", "missing"]},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["not_found"], ["missing"])
+        self.assertEqual(User.objects.filter(groups__name="Delivery crew").count(), 3)
+
+        response = self.client.delete(
+            "/api/groups/delivery-crew/users/batch",
+            {"ids": [user.pk for user in self.users[:2]] + [0]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["not_found"], [0])
+        self.assertEqual(
+            list(User.objects.filter(groups__name="Delivery crew")), [self.users[2]]
+        )
+
+    def test_invalid_batch(self):
+        response = self.client.post(
+            "/api/groups/manager/users/batch",
+            {"usernames": ["crew-0"], "ids": [1]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_not_manager_is_forbidden(self):
+        self.client.force_login(self.users[0])
+        response = self.client.post(
+            "/api/groups/manager/users/batch",
+            {"ids": [self.users[0].pk]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_role_checks_follow_recreated_groups(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(views.is_manager(self.manager))
+        # As if recreated by another process, without signals received here.
+        Group.objects.filter(name="Manager").delete()
+        Group.objects.bulk_create([Group(name="Manager")])
+        self.assertFalse(views.is_manager(self.manager))
+        Group.objects.get(name="Manager").user_set.add(self.manager)
+        self.assertTrue(views.is_manager(self.manager))
+
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(slug="mains", title="Mains")
+        self.menuitem = MenuItem.objects.create(
+            title="Soup", price="5.00", featured=False, category=category
+        )
+        self.customer = User.objects.create_user("customer")
+        self.orders = []
+        for status, days in [(True, 100), (True, 120), (False, 100), (True, 10)]:
+            order = Order.objects.create(
+                user=self.customer, total="5.00", status=status
+            )
+            OrderItem.objects.create(
+                order=order,
+                menuitem=self.menuitem,
+                quantity=1,
+                unit_price="5.00",
+                price="5.00",
+            )
+            Order.objects.filter(pk=order.pk).update(
+                date=order.date - timedelta(days=days)
+            )
+            self.orders.append(order)
+
+    def test_archive_delivered_orders_past_horizon(self):
+        call_command("archiveorders", batch_size=1, stdout=io.StringIO())
+
+        archived_ids = [self.orders[0].pk, self.orders[1].pk]
+        self.assertEqual(
+            sorted(ArchivedOrder.objects.values_list("pk", flat=True)), archived_ids
+        )
+        self.assertEqual(
+            sorted(ArchivedOrderItem.objects.values_list("order_id", flat=True)),
+            archived_ids,
+        )
+        self.assertFalse(Order.objects.filter(pk__in=archived_ids).exists())
+        self.assertEqual(OrderItem.objects.count(), 2)
+
+    def test_archiving_invalidates_cached_counts(self):
+        kitchen.create_tasks({order.pk: timezone.now() for order in self.orders})
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get("/api/orders").json()["count"], 4)
+
+        archive.archive_orders()
+        self.assertEqual(self.client.get("/api/orders").json()["count"], 2)
+        self.assertEqual(PrepTask.objects.count(), 2)
+
+    def test_orders_endpoints_query_archive_on_request(self):
+        archive.archive_orders()
+        self.client.force_login(self.customer)
+
+        response = self.client.get("/api/orders")
+        self.assertEqual(response.json()["count"], 2)
+        response = self.client.get("/api/orders?archived=true")
+        self.assertEqual(response.json()["count"], 2)
+        self.assertEqual(
+            response.json()["results"][0]["menuitem"]["title"], self.menuitem.title
+        )
+
+        path = f"/api/orders/{self.orders[0].pk}"
+        self.assertEqual(self.client.get(path).status_code, 404)
+        self.assertEqual(self.client.get(f"{path}?archived=true").status_code, 200)
+
+
+class CartExpiryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        category = Category.objects.create(slug="mains", title="Mains")
+        self.menuitems = [
+            MenuItem.objects.create(
+                title=f"Soup {n}", price="5.00", featured=False, category=category
+            )
+            for n in range(3)
+        ]
+        self.user = User.objects.create_user("customer")
+        for menuitem in self.menuitems:
+            add_to_cart(self.user, menuitem)
+        # Expire the first two lines.
+        Cart.objects.filter(menuitem__in=self.menuitems[:2]).update(
+            updated=carts.get_expiry() - timedelta(minutes=1)
+        )
+        self.client.force_login(self.user)
+
+    def test_expired_lines_are_hidden_and_replaced(self):
+        response = self.client.get("/api/cart/menu-items")
+        self.assertEqual(response.json()["count"], 1)
+
+        response = self.client.post(
+            "/api/cart/menu-items", {"menuitem": "Soup 0", "quantity": "2"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Cart.objects.get(menuitem=self.menuitems[0]).quantity, 2)
+
+    def test_cart_count_is_cached_within_a_minute(self):
+        now = timezone.now()
+        with mock.patch("LittleLemonAPI.carts.timezone.now") as carts_now:
+            carts_now.return_value = now.replace(second=0)
+            self.client.get("/api/cart/menu-items")
+            carts_now.return_value = now.replace(second=59)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get("/api/cart/menu-items")
+        self.assertEqual(response.json()["count"], 1)
+        self.assertFalse(any("COUNT(" in query["sql"] for query in queries))
+
+    def test_checkout_ignores_expired_lines(self):
+        self.client.post("/api/orders")
+        self.assertEqual(Order.objects.get().total, 5)
+
+    def test_purge_expired_in_batches(self):
+        with mock.patch("LittleLemonAPI.carts.time.sleep") as sleep:
+            with self.assertLogs("LittleLemonAPI.carts", "INFO"):
+                call_command(
+                    "expirecarts", batch_size=1, sleep=0.5, stdout=io.StringIO()
+                )
+        # Only between batches.
+        sleep.assert_called_once_with(0.5)
+        self.assertEqual(
+            list(Cart.objects.values_list("menuitem", flat=True)),
+            [self.menuitems[2].pk],
+        )
+        # Kept in the cache, as it is counted by the expirecarts process.
+        self.assertEqual(cache.get("metrics-counter:carts_purged"), 2)
+        self.assertEqual(metrics.snapshot()["counters"]["carts_purged"], 2)
+
+    def test_purged_count_is_shared_by_processes(self):
+        script = (
+            "import django\n"
+            "django.setup()\n"
+            "from LittleLemonAPI import metrics\n"
+            "metrics.increment('carts_purged', 3)\n"
+        )
+        # Like the expirecarts command, counted in another process.
+        subprocess.run(
+            [sys.executable, "-c", script], check=True, cwd=settings.BASE_DIR
+        )
+        self.assertEqual(metrics.snapshot()["counters"]["carts_purged"], 3)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = db_routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaMiddleware(self.get_response)
+
+    def get_response(self, request):
+        self.read_from_replicas = db_routers.reading_from_replicas()
+        return HttpResponse()
+
+    def test_router(self):
+        self.assertEqual(self.router.db_for_read(MenuItem), "default")
+        with db_routers.read_from_replicas():
+            self.assertEqual(self.router.db_for_read(MenuItem), "replica")
+            self.assertEqual(self.router.db_for_read(User), "default")
+            self.assertEqual(self.router.db_for_write(MenuItem), "default")
+        self.assertFalse(self.router.allow_migrate("replica", "LittleLemonAPI"))
+
+    def test_reads_own_writes_from_primary(self):
+        headers = {"HTTP_AUTHORIZATION": "Token writer"}
+        self.middleware(self.factory.get("/api/cart/menu-items", **headers))
+        self.assertTrue(self.read_from_replicas)
+
+        self.middleware(self.factory.post("/api/cart/menu-items", **headers))
+        self.assertFalse(self.read_from_replicas)
+        self.middleware(self.factory.get("/api/cart/menu-items", **headers))
+        self.assertFalse(self.read_from_replicas)
+
+        # Other clients keep reading from the replicas.
+        self.middleware(
+            self.factory.get("/api/cart/menu-items", HTTP_AUTHORIZATION="Token other")
+        )
+        self.assertTrue(self.read_from_replicas)
+
+    def test_reads_own_writes_on_other_workers(self):
+        response = self.middleware(self.factory.post("/api/cart/menu-items"))
+        cookie = response.cookies[ReplicaMiddleware.cookie_name]
+        self.assertEqual(cookie["max-age"], settings.READ_YOUR_WRITES_SECONDS)
+
+        # Another worker, which doesn't share the cache.
+        cache.clear()
+        request = self.factory.get("/api/cart/menu-items")
+        request.COOKIES[cookie.key] = cookie.value
+        self.middleware(request)
+        self.assertFalse(self.read_from_replicas)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_not_used_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaMiddleware(self.get_response)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaDatabaseTest(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        use_temporary_snapshot_dir(self)
+
+    def copy_replicas(self):
+        stdout = io.StringIO()
+        call_command("copyreplicas", stdout=stdout)
+        self.assertEqual(stdout.getvalue(), "Copied primary to replica\n")
+
+    def test_copy_primary_to_replica(self):
+        Category.objects.create(slug="mains", title="Mains")
+        with db_routers.read_from_replicas():
+            self.assertFalse(Category.objects.exists())
+
+        self.copy_replicas()
+        with db_routers.read_from_replicas():
+            self.assertEqual(Category.objects.get().title, "Mains")
+            self.assertEqual(Category.objects.using("replica").count(), 1)
+
+    def test_requests_read_own_writes_from_primary(self):
+        user = User.objects.create_user("customer")
+        self.copy_replicas()
+        Category.objects.create(slug="mains", title="Mains")
+        self.client.force_login(user)
+
+        # Served by the replica, which the category was not copied to.
+        self.assertEqual(self.client.get("/api/categories").json()["count"], 0)
+        self.client.post("/api/cart/menu-items", {})
+        self.assertEqual(self.client.get("/api/categories").json()["count"], 1)
+
+
+class MenuSnapshotTest(TestCase):
+    def setUp(self):
+        use_temporary_snapshot_dir(self)
+        self.category = Category.objects.create(slug="mains", title="Mains")
+
+    def create_menuitem(self, title):
+        menuitem = MenuItem.objects.create(
+            title=title, price="5.00", featured=False, category=self.category
+        )
+        call_command("runjobs", once=True)
+        return menuitem
+
+    def test_published_on_change(self):
+        self.create_menuitem("Soup")
+        version = snapshots.get_current_version()
+        response = self.client.get("/api/menu")
+        self.assertEqual(response.status_code, 200)
+        menu = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(menu["menu_items"][0]["title"], "Soup")
+        self.assertEqual(menu["categories"][0]["title"], "Mains")
+
+        self.create_menuitem("Salad")
+        self.assertNotEqual(snapshots.get_current_version(), version)
+        response = self.client.get("/api/menu?format=xml", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn(b"Salad", gzip.decompress(b"".join(response.streaming_content)))
+
+        response = self.client.get(
+            "/api/menu?format=xml", HTTP_ACCEPT_ENCODING="gzip;q=0, identity"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn(b"Salad", b"".join(response.streaming_content))
+
+    def test_not_modified(self):
+        response = self.client.get("/api/menu")
+        response = self.client.get("/api/menu", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_are_published_once(self):
+        with transaction.atomic():
+            for title in ("Soup", "Salad", "Bread"):
+                MenuItem.objects.create(
+                    title=title, price="5.00", featured=False, category=self.category
+                )
+        self.assertEqual(Job.objects.filter(name="menu.publish").count(), 1)
+
+        with mock.patch(
+            "LittleLemonAPI.tasks.snapshots.publish", wraps=snapshots.publish
+        ) as publish:
+            call_command("runjobs", once=True)
+        publish.assert_called_once_with()
+        self.assertIsNotNone(snapshots.get_current_version())
+
+    def test_old_versions_are_deleted(self):
+        for n in range(snapshots.KEEP_VERSIONS + 2):
+            self.create_menuitem(f"Soup {n}")
+        self.assertEqual(
+            len(list(snapshots.get_directory().glob("menu-*.json"))),
+            snapshots.KEEP_VERSIONS,
+        )
+
+
+class CompressionMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_small()
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(COMPRESSION={"MIN_SIZE": 100})
+    def test_compresses_accepted_encoding(self):
+        response = self.client.get("/api/menu-items", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        menu = json.loads(gzip.decompress(response.content))
+        self.assertIn("results", menu)
+
+        response = self.client.get(
+            "/api/menu-items", HTTP_ACCEPT_ENCODING="gzip;q=0, identity"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get("/api/categories", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_streaming_response(self):
+        lines = [b"id,title\n"] + [b"%d,Soup\n" % n for n in range(1000)]
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(lines), content_type="text/csv")
+        )
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        response = middleware(request)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)), b"".join(lines)
+        )
+
+    def test_compressed_bodies_are_reused(self):
+        middleware = CompressionMiddleware(None)
+        content = b"Soup " * 1000
+        compressed = middleware.compress_cached(content, "gzip")
+        self.assertIs(middleware.compress_cached(content, "gzip"), compressed)
+
+
+class BatchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(slug="mains", title="Mains")
+        MenuItem.objects.create(
+            title="Soup", price="5.00", featured=True, category=category
+        )
+        self.customer = User.objects.create_user("customer")
+        self.client.force_login(self.customer)
+
+    def post(self, requests, **data):
+        return self.client.post(
+            "/api/batch",
+            {"requests": requests, **data},
+            content_type="application/json",
+        )
+
+    def test_runs_requests_in_order(self):
+        response = self.post(
+            [
+                {
+                    "method": "POST",
+                    "path": "/api/cart/menu-items",
+                    "body": {"menuitem": "Soup", "quantity": 2},
+                },
+                {"method": "GET", "path": "/api/cart/menu-items"},
+                {"method": "GET", "path": "/api/menu-items?featured=True"},
+                {"method": "GET", "path": "/api/nowhere"},
+                {"method": "GET", "path": "/auth/users/"},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        responses = response.json()["responses"]
+        self.assertEqual(
+            [response["status"] for response in responses], [201, 200, 200, 404, 404]
+        )
+        self.assertEqual(responses[1]["body"]["results"][0]["quantity"], 2)
+        self.assertEqual(responses[2]["body"]["count"], 1)
+
+    def test_authenticates_with_token(self):
+        self.client.logout()
+        token = Token.objects.create(user=self.customer)
+        response = self.client.post(
+            "/api/batch",
+            {"requests": [{"method": "GET", "path": "/api/cart/menu-items"}]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {token.key}",
+        )
+        self.assertEqual(response.json()["responses"][0]["status"], 200)
+
+    def test_anonymous_sub_requests_are_unauthenticated(self):
+        self.client.logout()
+        response = self.post([{"method": "GET", "path": "/api/cart/menu-items"}])
+        self.assertEqual(response.json()["responses"][0]["status"], 401)
+
+    def test_failed_request_does_not_fail_batch(self):
+        with mock.patch.object(
+            views.CategoryView, "list", side_effect=RuntimeError("Failed")
+        ), self.assertLogs("LittleLemonAPI.batch", "ERROR"):
+            response = self.post(
+                [
+                    {
+                        "method": "POST",
+                        "path": "/api/cart/menu-items",
+                        "body": {"menuitem": "Soup", "quantity": 2},
+                    },
+                    {"method": "GET", "path": "/api/categories"},
+                    {"method": "GET", "path": "/api/cart/menu-items"},
+                ]
+            )
+        self.assertEqual(response.status_code, 200)
+        responses = response.json()["responses"]
+        self.assertEqual(
+            [response["status"] for response in responses], [201, 500, 200]
+        )
+        self.assertEqual(len(responses[2]["body"]["results"]), 1)
+
+    def test_batch_cannot_be_nested(self):
+        response = self.post([{"method": "POST", "path": "/api/batch"}])
+        self.assertEqual(response.json()["responses"][0]["status"], 404)
+
+
+class ParallelBatchTest(TransactionTestCase):
+    def setUp(self):
+        use_temporary_snapshot_dir(self)
+
+    def test_runs_reads_concurrently(self):
+        seed_small()
+        customer = User.objects.create_user("customer")
+        self.client.force_login(customer)
+        paths = ["/api/categories", "/api/menu-items", "/api/cart/menu-items"]
+        response = self.client.post(
+            "/api/batch",
+            {
+                "requests": [{"method": "GET", "path": path} for path in paths],
+                "parallel": True,
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(
+            [response["status"] for response in response.json()["responses"]],
+            [200, 200, 200],
+        )
+
+    def test_counts_queries_of_threads(self):
+        seed_small()
+        customer = User.objects.create_user("customer")
+        self.client.force_login(customer)
+        requests = [{"method": "GET", "path": "/api/menu-items"}] * 3
+
+        def count_queries(parallel):
+            cache.clear()
+            response = self.client.post(
+                "/api/batch",
+                {"requests": requests, "parallel": parallel},
+                content_type="application/json",
+            )
+            return int(re.search(r"(\d+) queries", response["Server-Timing"])[1])
+
+        self.assertGreaterEqual(count_queries(True), count_queries(False))
+
+
+class BinaryFormatTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(slug="mains", title="Mains")
+        self.menuitem = MenuItem.objects.create(
+            title="Soup", price="5.50", featured=False, category=category
+        )
+        self.customer = User.objects.create_user("customer")
+        order = Order.objects.create(user=self.customer, total="11.00")
+        OrderItem.objects.create(
+            order=order,
+            menuitem=self.menuitem,
+            quantity=2,
+            unit_price="5.50",
+            price="11.00",
+        )
+        self.client.force_login(self.customer)
+
+    def check_format(self, media_type, loads):
+        response = self.client.get("/api/orders", HTTP_ACCEPT=media_type)
+        self.assertEqual(response["Content-Type"], media_type)
+        [order_item] = loads(response.content)["results"]
+        self.assertEqual(order_item["total_price"], "11.00")
+        self.assertEqual(order_item["menuitem"]["price"], "5.50")
+        self.assertEqual(order_item["order"]["date"], str(timezone.localdate()))
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        self.check_format("application/msgpack", msgpack.unpackb)
+
+        response = self.client.post(
+            "/api/batch",
+            msgpack.packb({"requests": [{"method": "GET", "path": "/api/orders"}]}),
+            content_type="application/msgpack",
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            "/api/batch", b"\xc1", content_type="application/msgpack"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @unittest.skipIf(cbor2 is None, "cbor2 is not installed")
+    def test_cbor(self):
+        self.check_format("application/cbor", cbor2.loads)
+
+        response = self.client.post(
+            "/api/batch",
+            cbor2.dumps({"requests": [{"method": "GET", "path": "/api/orders"}]}),
+            content_type="application/cbor",
+            HTTP_ACCEPT="application/cbor",
+        )
+        [order_response] = cbor2.loads(response.content)["responses"]
+        self.assertEqual(order_response["body"]["count"], 1)
+
+
+@override_settings(PROFILING={"ENABLED": True})
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_small()
+        cls.manager = User.objects.filter(groups__name="Manager").first()
+        cls.customer = User.objects.create_user("customer")
+
+    def setUp(self):
+        cache.clear()
+        profiling.clear()
+
+    def test_manager_profiles_request(self):
+        self.client.force_login(self.manager)
+        response = self.client.get("/api/orders/1", HTTP_X_PROFILE="1")
+        profile_id = response["X-Profile-Id"]
+
+        [summary] = self.client.get("/api/profiles").json()
+        self.assertEqual(summary["path"], "/api/orders/1")
+        self.assertEqual(summary["user"], self.manager.username)
+        self.assertGreater(summary["queries"], 0)
+
+        response = self.client.get(f"/api/profiles/{profile_id}")
+        self.assertIn("SELECT", response.json()["sql"][0]["sql"])
+        self.assertIn("cumulative", response.json()["stats"])
+        response = self.client.get(f"/api/profiles/{profile_id}?download=true")
+        self.assertIsInstance(marshal.loads(response.content), dict)
+
+    def test_token_authenticated_manager(self):
+        token = Token.objects.create(user=self.manager)
+        response = self.client.get(
+            "/api/menu-items?profile",
+            HTTP_AUTHORIZATION=f"Token {token.key}",
+        )
+        self.assertTrue(response.has_header("X-Profile-Id"))
+
+    def test_other_users_are_not_profiled(self):
+        self.client.force_login(self.customer)
+        response = self.client.get("/api/menu-items?profile")
+        self.assertFalse(response.has_header("X-Profile-Id"))
+        self.assertEqual(self.client.get("/api/profiles").status_code, 403)
+
+    @override_settings(PROFILING={"ENABLED": True, "SAMPLE_RATE": 1})
+    def test_sampled_requests(self):
+        response = self.client.get("/api/menu-items")
+        self.assertTrue(response.has_header("X-Profile-Id"))
+
+    @override_settings(PROFILING={"ENABLED": True, "MAX_PROFILES": 2})
+    def test_keeps_most_recent_profiles(self):
+        for n in range(3):
+            with profiling.profile("GET", f"/{n}"):
+                pass
+        self.assertEqual(
+            [profile.path for profile in profiling.get_profiles()], ["/2", "/1"]
+        )
+
+    def test_profiles_are_kept_in_cache(self):
+        with profiling.profile("GET", "/menu") as current:
+            pass
+        # Another worker sharing the cache finds the profile by its id.
+        self.assertEqual(cache.get(f"profile:{current.id}").path, "/menu")
+        self.client.force_login(self.manager)
+        response = self.client.get(f"/api/profiles/{current.id}")
+        self.assertEqual(response.json()["worker"], profiling.WORKER)
+        response = self.client.get(f"/api/profiles/{uuid.uuid4()}")
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(PROFILING={"ENABLED": False})
+    def test_not_used_when_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            profiling.ProfilingMiddleware(None)
+
+
+class CachedCountPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_small()
+        cls.manager = User.objects.filter(groups__name="Manager").first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.manager)
+
+    def test_counts_are_cached_until_written(self):
+        count = self.client.get("/api/menu-items").json()["count"]
+        with self.assertNumQueries(3):
+            # Session, user and page, without counting menu items.
+            response = self.client.get("/api/menu-items?page=2")
+        self.assertEqual(response.json()["count"], count)
+
+        category = Category.objects.first()
+        MenuItem.objects.create(
+            title="Soup", price="5.00", featured=False, category=category
+        )
+        response = self.client.get("/api/menu-items")
+        self.assertEqual(response.json()["count"], count + 1)
+
+    def test_cascading_deletes_invalidate_counts(self):
+        count = self.client.get("/api/orders").json()["count"]
+        order_item = OrderItem.objects.first()
+        order_items_count = OrderItem.objects.filter(order=order_item.order).count()
+        # Deletes the order items of the order too.
+        Order.objects.filter(pk=order_item.order_id).delete()
+        response = self.client.get("/api/orders")
+        self.assertEqual(response.json()["count"], count - order_items_count)
+
+    def test_bulk_writes_invalidate_counts(self):
+        count = self.client.get("/api/orders").json()["count"]
+        OrderItem.objects.all()[:1].get().delete()
+        pagination.invalidate_counts(OrderItem)
+        self.assertEqual(self.client.get("/api/orders").json()["count"], count - 1)
+
+    @override_settings(PAGINATION={"APPROXIMATE_COUNT_THRESHOLD": 3})
+    def test_approximate_count_above_threshold(self):
+        menuitem_count = MenuItem.objects.count()
+        last_page = (menuitem_count + 1) // 2
+        response = self.client.get("/api/menu-items")
+        self.assertIsNone(response.json()["count"])
+        self.assertIsNotNone(response.json()["next"])
+
+        response = self.client.get(f"/api/menu-items?page={last_page}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["next"])
+        response = self.client.get("/api/menu-items?page=last")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(f"/api/menu-items?page={last_page + 1}")
+        self.assertEqual(response.status_code, 404)
+
+
+class WarmUpTest(TestCase):
+    def test_warm_up_does_not_query(self):
+        with self.assertNumQueries(0):
+            timings = warmup.warm_up()
+        self.assertGreater(timings["urls"][0], 0)
+        self.assertGreater(timings["serializers"][0], 0)
+
+    def test_view_classes_include_included_urls(self):
+        self.assertIn(views.MenuItemsView, warmup.get_view_classes())
+
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   djoser.conf\n"
+            "import time:        80 |        200 | djoser\n"
+        )
+        self.assertEqual(
+            importprofile.parse_importtime(output),
+            [("djoser.conf", 120, 120), ("djoser", 80, 200)],
+        )
+
+
+class LeanSettingsTest(TestCase):
+    script = (
+        "import django\n"
+        "from django.test import Client\n"
+        "django.setup()\n"
+        "for host in ('api.littlelemon.com', 'example.com'):\n"
+        "    print(Client(HTTP_HOST=host).get('/api/orders').status_code)\n"
+    )
+
+    def run_script(self, allowed_hosts):
+        # Settings are loaded once per process, so use a fresh interpreter.
+        return subprocess.run(
+            [sys.executable, "-c", self.script],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                "DJANGO_SETTINGS_MODULE": "LittleLemon.settings_lean",
+                "DJANGO_ALLOWED_HOSTS": allowed_hosts,
+            },
+        )
+
+    def test_serves_allowed_hosts(self):
+        result = self.run_script("api.littlelemon.com, ")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        # Unauthenticated on the allowed host, and rejected on other hosts.
+        self.assertEqual(result.stdout.split(), ["401", "400"])
+
+    def test_allowed_hosts_are_required(self):
+        result = self.run_script("")
+        self.assertIn("ImproperlyConfigured", result.stderr)
+        self.assertIn("DJANGO_ALLOWED_HOSTS", result.stderr)
+
+
+class KitchenTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(slug="mains", title="Mains")
+        cls.soup = MenuItem.objects.create(
+            title="Soup", price="5.00", featured=False, category=category, prep_time=5
+        )
+        cls.roast = MenuItem.objects.create(
+            title="Roast", price="9.00", featured=False, category=category, prep_time=25
+        )
+        cls.manager = User.objects.create_user("manager")
+        cls.manager.groups.add(Group.objects.create(name="Manager"))
+        cls.customer = User.objects.create_user("customer")
+
+    def setUp(self):
+        kitchen.queue.clear()
+        self.client.force_login(self.manager)
+
+    def create_order(self, *menuitems):
+        order = Order.objects.create(user=self.customer, total="0.00")
+        for menuitem in menuitems:
+            OrderItem.objects.create(
+                order=order,
+                menuitem=menuitem,
+                quantity=1,
+                unit_price=menuitem.price,
+                price=menuitem.price,
+            )
+        return order
+
+    def test_order_created_job_creates_tasks_once(self):
+        order = self.create_order(self.soup, self.roast)
+        tasks.order_created([{"order_id": order.pk}])
+        tasks.order_created([{"order_id": order.pk}])
+
+        roast_task, soup_task = PrepTask.objects.order_by("start_by")
+        self.assertEqual(roast_task.menuitem, self.roast)
+        # The soup is started later, to be ready with the roast.
+        self.assertEqual(
+            soup_task.start_by - roast_task.start_by, timedelta(minutes=20)
+        )
+        self.assertEqual(soup_task.status, PrepTask.QUEUED)
+
+    def test_delayed_jobs_keep_order_times(self):
+        older_order = self.create_order(self.soup)
+        order = self.create_order(self.soup)
+        ordered = timezone.now() - timedelta(minutes=10)
+        # The job of the newer order ran first, and the older one was retried.
+        tasks.order_created(
+            [{"order_id": order.pk, "ordered": timezone.now().isoformat()}]
+        )
+        tasks.order_created(
+            [{"order_id": older_order.pk, "ordered": ordered.isoformat()}]
+        )
+
+        first_task = PrepTask.objects.order_by("start_by").first()
+        self.assertEqual(first_task.order_id, older_order.pk)
+        self.assertEqual(first_task.start_by, ordered)
+
+    def test_claims_tasks_created_by_jobs(self):
+        response = self.client.post("/api/kitchen/tasks/claim", {"station": "grill"})
+        self.assertEqual(response.status_code, 204)
+
+        order = self.create_order(self.soup)
+        tasks.order_created([{"order_id": order.pk}])
+        # The queue is empty, so it is reloaded with the new task.
+        response = self.client.post("/api/kitchen/tasks/claim", {"station": "grill"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["order_id"], order.pk)
+
+    def test_expired_claims_are_requeued(self):
+        kitchen.create_tasks({self.create_order(self.soup).pk: timezone.now()})
+        task_id = kitchen.queue.claim("grill")
+        PrepTask.objects.update(claimed=timezone.now() - timedelta(hours=1))
+
+        kitchen.queue.clear()
+        self.assertEqual(kitchen.queue.claim("fryer"), task_id)
+        # Only the station holding the claim completes the task.
+        self.assertFalse(kitchen.complete(task_id, "grill"))
+        self.assertTrue(kitchen.complete(task_id, "fryer"))
+
+    def test_claim_and_complete_tasks(self):
+        older_order = self.create_order(self.soup)
+        kitchen.create_tasks({older_order.pk: timezone.now() - timedelta(minutes=5)})
+        kitchen.create_tasks({self.create_order(self.soup).pk: timezone.now()})
+
+        response = self.client.get("/api/kitchen/tasks")
+        self.assertEqual(response.json()["count"], 2)
+
+        response = self.client.post("/api/kitchen/tasks/claim", {"station": "grill"})
+        self.assertEqual(response.status_code, 200)
+        task = response.json()
+        self.assertEqual(task["order_id"], older_order.pk)
+        self.assertEqual(task["status"], PrepTask.CLAIMED)
+
+        complete_path = f"/api/kitchen/tasks/{task['id']}/complete"
+        response = self.client.post(complete_path, {"station": "fryer"})
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post(complete_path, {"station": "grill"})
+        self.assertEqual(response.json()["status"], PrepTask.DONE)
+        response = self.client.post(complete_path, {"station": "grill"})
+        self.assertEqual(response.status_code, 409)
+
+        response = self.client.get("/api/kitchen/tasks?status=done")
+        self.assertEqual(response.json()["count"], 1)
+        self.client.post("/api/kitchen/tasks/claim", {"station": "grill"})
+        response = self.client.post("/api/kitchen/tasks/claim", {"station": "grill"})
+        self.assertEqual(response.status_code, 204)
+
+    def test_only_managers_use_the_kitchen_queue(self):
+        self.client.force_login(self.customer)
+        response = self.client.post("/api/kitchen/tasks/claim", {"station": "grill"})
+        self.assertEqual(response.status_code, 403)
+
+
+class KitchenConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        use_temporary_snapshot_dir(self)
+        kitchen.queue.clear()
+
+    def test_stations_never_claim_the_same_task(self):
+        category = Category.objects.create(slug="mains", title="Mains")
+        menuitem = MenuItem.objects.create(
+            title="Soup", price="5.00", featured=False, category=category
+        )
+        customer = User.objects.create_user("customer")
+        orders = {}
+        for _ in range(20):
+            order = Order.objects.create(user=customer, total="5.00")
+            OrderItem.objects.create(
+                order=order,
+                menuitem=menuitem,
+                quantity=1,
+                unit_price="5.00",
+                price="5.00",
+            )
+            orders[order.pk] = timezone.now()
+        kitchen.create_tasks(orders)
+
+        claimed = []
+
+        def claim_all(station):
+            # Queues of separate processes, all holding all tasks.
+            queue = kitchen.PrepQueue()
+            try:
+                while (task_id := queue.claim(station)) is not None:
+                    claimed.append(task_id)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=claim_all, args=[f"station-{index}"])
+            for index in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(claimed), len(orders))
+        self.assertEqual(len(set(claimed)), len(orders))
+        self.assertFalse(PrepTask.objects.filter(status=PrepTask.QUEUED).exists())
@@ -8,15 +8,29 @@ urlpatterns = [
     path("categories", views.CategoryView.as_view()),
     path("menu-items", views.MenuItemsView.as_view()),
     path("menu-items/<int:pk>", views.SingleMenuItemView.as_view()),
+    path("menu", views.menu_snapshot),
     # User role management endpoints.
     path("groups/manager/users", views.ManagersView.as_view()),
     path("groups/manager/users/<int:pk>", views.RemoveManagerView.as_view()),
+    path("groups/manager/users/batch", views.ManagersBatchView.as_view()),
     path("groups/delivery-crew/users", views.DeliveryCrewView.as_view()),
     path("groups/delivery-crew/users/<int:pk>", views.RemoveDeliveryCrewView.as_view()),
+    path("groups/delivery-crew/users/batch", views.DeliveryCrewBatchView.as_view()),
     # Cart and Order management endpoints.
     path("cart/menu-items", views.CartView.as_view()),
     path("cart/orders", views.OrdersView.as_view()),
     path("orders", views.OrdersView.as_view()),
     path("cart/orders/<int:pk>", views.SingleOrderView.as_view()),
     path("orders/<int:pk>", views.SingleOrderView.as_view()),
+    path("orders/batch", views.BulkOrderUpdateView.as_view()),
+    # Kitchen preparation queue endpoints.
+    path("kitchen/tasks", views.PrepTasksView.as_view()),
+    path("kitchen/tasks/claim", views.ClaimPrepTaskView.as_view()),
+    path("kitchen/tasks/<int:pk>/complete", views.CompletePrepTaskView.as_view()),
+    # Batch request endpoint.
+    path("batch", views.BatchView.as_view()),
+    # Performance metrics and profiling endpoints.
+    path("metrics", views.MetricsView.as_view()),
+    path("profiles", views.ProfilesView.as_view()),
+    path("profiles/<uuid:pk>", views.SingleProfileView.as_view()),
 ]
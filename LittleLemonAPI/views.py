@@ -2,27 +2,74 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+from rest_framework.renderers import JSONRenderer
 from django.contrib.auth.models import User, Group
 from django.shortcuts import get_object_or_404
-from django.http import Http404
-
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.views.decorators.http import require_safe
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+
+from . import (
+    batch,
+    carts,
+    jobs,
+    kitchen,
+    metrics,
+    pagination,
+    profiling,
+    snapshots,
+    webhooks,
+)
+from .models import (
+    Category,
+    MenuItem,
+    Cart,
+    Order,
+    OrderItem,
+    ArchivedOrder,
+    ArchivedOrderItem,
+    PrepTask,
+)
+from .middleware import accepts_encoding, parse_accept_encoding
+from .renderers import PrometheusRenderer
 from .serializers import (
     CategorySerializer,
     MenuItemSerializer,
     UserSerializer,
     CartSerializer,
     OrderItemSerializer,
+    ArchivedOrderItemSerializer,
+    OrderBulkUpdateSerializer,
+    UserBatchSerializer,
+    BatchRequestSerializer,
+    PrepTaskSerializer,
+    PrepTaskClaimSerializer,
 )
 
 
+def get_group_id(group_name: str):
+    """Return the id of a group specified by name, or None if missing."""
+    return Group.objects.filter(name=group_name).values_list("pk", flat=True).first()
+
+
+def in_group(user: User, group_name: str):
+    """Checks if user belongs to a group specified by name as a string."""
+    # Join on the group name rather than caching group ids per process, as
+    # groups may be recreated with new ids by other processes.
+    return User.groups.through.objects.filter(
+        user_id=user.pk, group__name=group_name
+    ).exists()
+
+
 def is_manager(user: User):
     """
     Checks if user making the request belongs to the manager role.
 
     Also return True if user is a superuser.
     """
-    if user.groups.filter(name="Manager").exists() or user.is_superuser:
+    if user.is_superuser or in_group(user, "Manager"):
         return True
     else:
         return False
@@ -30,19 +77,107 @@ def is_manager(user: User):
 
 def is_delivery_crew(user: User):
     """Checks if user making the request belongs to the delivery crew role."""
-    return user.groups.filter(name="Delivery crew").exists()
+    return in_group(user, "Delivery crew")
+
+
+def get_group_id_or_404(group_name: str):
+    group_id = get_group_id(group_name)
+    if group_id is None:
+        raise Http404("No Group matches the given query.")
+    return group_id
 
 
 def assign_user_to_group(user: User, group_name: str):
     """Assign instance of a user to a group specified by name as a string."""
-    manager_group = get_object_or_404(Group, name=group_name)
-    manager_group.user_set.add(user)
+    user.groups.add(get_group_id_or_404(group_name))
+    pagination.invalidate_counts(User.groups.through)
 
 
 def remove_user_from_group(user: User, group_name: str):
     """Remove instance of a user from a group specified by name as a string."""
-    manager_group = get_object_or_404(Group, name=group_name)
-    user.groups.remove(manager_group)
+    user.groups.remove(get_group_id_or_404(group_name))
+    pagination.invalidate_counts(User.groups.through)
+
+
+def assign_users_to_group(user_ids, group_name: str):
+    """
+    Assign users specified by id to a group specified by name as a string.
+
+    Writes all memberships with one insert, and returns the number of users added.
+    """
+    group_id = get_group_id_or_404(group_name)
+    Membership = User.groups.through
+    existing = set(
+        Membership.objects.filter(group_id=group_id, user_id__in=user_ids).values_list(
+            "user_id", flat=True
+        )
+    )
+    new_memberships = [
+        Membership(user_id=user_id, group_id=group_id)
+        for user_id in set(user_ids) - existing
+    ]
+    Membership.objects.bulk_create(new_memberships, ignore_conflicts=True)
+    pagination.invalidate_counts(Membership)
+    return len(new_memberships)
+
+
+def remove_users_from_group(user_ids, group_name: str):
+    """
+    Remove users specified by id from a group specified by name as a string.
+
+    Deletes all memberships with one delete, and returns the number of users removed.
+    """
+    group_id = get_group_id_or_404(group_name)
+    deleted, _ = User.groups.through.objects.filter(
+        group_id=group_id, user_id__in=user_ids
+    ).delete()
+    pagination.invalidate_counts(User.groups.through)
+    return deleted
+
+
+def is_archive_request(request):
+    """Checks if a GET request asks for archived orders with ?archived=true."""
+    return request.query_params.get("archived", "").lower() in ("true", "1")
+
+
+@transaction.atomic
+def save_order(order: Order):
+    """Save an updated order and its outbox job and event in one transaction."""
+    order.save()
+    jobs.enqueue("order.updated", {"order_id": order.pk})
+    webhooks.record_order_events("order.updated", [order])
+
+
+class OutOfStock(Exception):
+    """Raised when a menu item has insufficient stock for an order."""
+
+
+def reserve_stock(quantities: dict):
+    """
+    Decrement the stock of menu items by quantities keyed by menu item id.
+
+    All items are decremented with one conditional update, which only matches
+    items with enough stock or without stock tracking, so concurrent orders can't
+    oversell. Raises OutOfStock if any item has insufficient stock, which must
+    roll back the enclosing transaction.
+    """
+    quantity = Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in quantities.items()],
+        output_field=IntegerField(),
+    )
+    updated_count = (
+        MenuItem.objects.filter(pk__in=quantities)
+        .filter(Q(stock__isnull=True) | Q(stock__gte=quantity))
+        .update(stock=F("stock") - quantity)
+    )
+    if updated_count != len(quantities):
+        raise OutOfStock
+    sold_out_count = MenuItem.objects.filter(
+        pk__in=quantities, stock=0, sold_out=False
+    ).update(sold_out=True)
+    if sold_out_count:
+        pagination.invalidate_counts(MenuItem)
+        snapshots.request_publish()
 
 
 class CategoryView(generics.ListCreateAPIView):
@@ -61,13 +196,13 @@ class CategoryView(generics.ListCreateAPIView):
 
 
 class MenuItemsView(generics.ListCreateAPIView):
-    queryset = MenuItem.objects.all()
+    queryset = MenuItem.objects.select_related("category")
     serializer_class = MenuItemSerializer
     permission_classes = [AllowAny]
     ordering_fields = ["category__title", "title", "price", "featured"]
     search_fields = ["category__title", "title"]
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
-    filterset_fields = ["category", "featured"]
+    filterset_fields = ["category", "featured", "sold_out"]
 
     def post(self, request, *args, **kwargs):
         # Only allow request from managers.
@@ -79,7 +214,7 @@ class MenuItemsView(generics.ListCreateAPIView):
 
 
 class SingleMenuItemView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = MenuItem.objects.all()
+    queryset = MenuItem.objects.select_related("category")
     serializer_class = MenuItemSerializer
     permission_classes = [AllowAny]
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
@@ -111,6 +246,36 @@ class SingleMenuItemView(generics.RetrieveUpdateDestroyAPIView):
         return Response({"message": "Item deleted"}, status=status.HTTP_200_OK)
 
 
+@require_safe
+def menu_snapshot(request):
+    """
+    Serve the published menu snapshot as a static file, bypassing DRF.
+
+    JSON by default and XML with ?format=xml, gzipped for clients accepting it.
+    """
+    format = "xml" if request.GET.get("format") == "xml" else "json"
+    accepted = parse_accept_encoding(request.headers.get("Accept-Encoding", ""))
+    compressed = accepts_encoding(accepted, "gzip")
+    version = snapshots.get_current_version() or snapshots.publish()
+    etag = f'"{version}-{format}"'
+    if etag in request.headers.get("If-None-Match", ""):
+        return HttpResponseNotModified(headers={"ETag": etag})
+
+    try:
+        file = open(snapshots.get_path(version, format, compressed), "rb")
+    except FileNotFoundError:
+        # Snapshot files were deleted, publish them again.
+        version = snapshots.publish()
+        file = open(snapshots.get_path(version, format, compressed), "rb")
+    response = FileResponse(file, content_type=f"application/{format}")
+    if compressed:
+        response["Content-Encoding"] = "gzip"
+    response["ETag"] = etag
+    response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = "public, max-age=60"
+    return response
+
+
 class ManagersView(generics.ListCreateAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -220,6 +385,71 @@ class RemoveDeliveryCrewView(generics.DestroyAPIView):
         )
 
 
+class GroupUsersBatchView(generics.GenericAPIView):
+    """
+    Add or remove many users to or from a group at once.
+
+    Users are specified by a list of "usernames" or "ids", and resolved with one
+    query. Users not found are listed in the response.
+    """
+
+    permission_classes = [IsAuthenticated]
+    group_name = None
+
+    def get_user_ids(self, request):
+        serializer = UserBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if "usernames" in serializer.validated_data:
+            field, values = "username", serializer.validated_data["usernames"]
+        else:
+            field, values = "pk", serializer.validated_data["ids"]
+        users = dict(
+            User.objects.filter(**{f"{field}__in": values}).values_list(field, "pk")
+        )
+        not_found = [value for value in dict.fromkeys(values) if value not in users]
+        return list(users.values()), not_found
+
+    def post(self, request, *args, **kwargs):
+        # Only allow request from managers.
+        if not is_manager(self.request.user):
+            return Response(
+                {"message": "You are not authorized"}, status.HTTP_403_FORBIDDEN
+            )
+        user_ids, not_found = self.get_user_ids(request)
+        added = assign_users_to_group(user_ids, self.group_name)
+        return Response(
+            {
+                "message": f"{added} users added to the {self.group_name} group",
+                "not_found": not_found,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    def delete(self, request, *args, **kwargs):
+        # Only allow request from managers.
+        if not is_manager(self.request.user):
+            return Response(
+                {"message": "You are not authorized"}, status.HTTP_403_FORBIDDEN
+            )
+        user_ids, not_found = self.get_user_ids(request)
+        removed = remove_users_from_group(user_ids, self.group_name)
+        return Response(
+            {
+                "message": f"{removed} users removed from the {self.group_name} group",
+                "not_found": not_found,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class ManagersBatchView(GroupUsersBatchView):
+    group_name = "Manager"
+
+
+class DeliveryCrewBatchView(GroupUsersBatchView):
+    group_name = "Delivery crew"
+
+
 class CartView(generics.ListCreateAPIView, generics.DestroyAPIView):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
@@ -227,22 +457,31 @@ class CartView(generics.ListCreateAPIView, generics.DestroyAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return Cart.objects.filter(user=user)
+        return carts.active_carts().filter(user=user).select_related("user", "menuitem")
 
     def post(self, request, *args, **kwargs):
         # Get current user, menuitem by title, and other POST request data.
         user = self.request.user
         request_data = self.request.POST
         menuitem = get_object_or_404(MenuItem, title=request_data.get("menuitem"))
+        if menuitem.sold_out:
+            return Response(
+                {"message": "Item is sold out"}, status=status.HTTP_400_BAD_REQUEST
+            )
         quantity = int(request_data.get("quantity"))
         unit_price = menuitem.price
+        # Replace an expired line of the same item, not yet purged.
+        Cart.objects.filter(
+            user=user, menuitem=menuitem, updated__lt=carts.get_expiry()
+        ).delete()
 
-        # Create cart and write to db.
+        # Create cart and write to db, pinned to the current price version.
         cart = Cart(
             user=user,
             menuitem=menuitem,
             quantity=quantity,
             unit_price=unit_price,
+            price_version_id=menuitem.price_version_id,
             # Price is calculated by the serializer.
             # price=quantity * unit_price,
         )
@@ -256,6 +495,7 @@ class CartView(generics.ListCreateAPIView, generics.DestroyAPIView):
         user = self.request.user
         carts = Cart.objects.filter(user=user)
         carts.delete()
+        pagination.invalidate_counts(Cart)
         return Response({"message": "Cart now empty"}, status=status.HTTP_200_OK)
 
 
@@ -276,44 +516,112 @@ class OrdersView(generics.ListCreateAPIView):
         "order__user",
     ]
 
+    def get_serializer_class(self):
+        if is_archive_request(self.request):
+            return ArchivedOrderItemSerializer
+        return OrderItemSerializer
+
     def get_queryset(self):
+        # Delivered orders past the archive horizon are only listed on request.
+        model = ArchivedOrderItem if is_archive_request(self.request) else OrderItem
+        # Join the order and menu item serialized with every order item.
+        order_items = model.objects.select_related("order", "menuitem__category")
+
         # Return all orders to managers and assigned orders to delivery crew.
         if is_manager(self.request.user):
-            return OrderItem.objects.all()
+            return order_items
         elif is_delivery_crew(self.request.user):
-            return OrderItem.objects.filter(order__delivery_crew=self.request.user)
+            return order_items.filter(order__delivery_crew=self.request.user)
 
         # User created orders only if not manager or delivery crew.
-        return OrderItem.objects.filter(order__user=self.request.user)
+        return order_items.filter(order__user=self.request.user)
 
     def post(self, request, *args, **kwargs):
         # Get current user and all items in users cart.
         user = self.request.user
-        cart_items = Cart.objects.filter(user=user)
-
-        # Create new order and transfer items from cart.
-        order_total = 0
-        for cart_item in cart_items:
-            order_total += cart_item.quantity * cart_item.unit_price
-        new_order = Order(
-            user=user,
-            total=order_total,
-        )
-        # Write order and all order items to db, and delete cart items in one hit.
-        order_items = []
-        for cart_item in cart_items:
-            order_items.append(
-                OrderItem(
-                    order=new_order,
-                    menuitem=cart_item.menuitem,
-                    quantity=cart_item.quantity,
-                    unit_price=cart_item.unit_price,
-                    price=cart_item.quantity * cart_item.unit_price,
+        cart_items = carts.active_carts().filter(user=user).select_related("menuitem")
+
+        try:
+            with transaction.atomic():
+                # Lock the menu items of the cart, so their prices can't change
+                # until the order is committed. SQLite has no row locks, but only
+                # allows a single writer from the first update below, so it must
+                # not read first, which would fail when upgrading to a write.
+                if connection.features.has_select_for_update:
+                    list(
+                        MenuItem.objects.select_for_update()
+                        .filter(pk__in=cart_items.values("menuitem_id"))
+                        .values_list("pk", flat=True)
+                    )
+                # Revalidate all cart items against current price versions in one
+                # query, refreshing any stale unit prices before the user is
+                # charged. The refreshed prices are committed with the response.
+                current_menuitem = MenuItem.objects.filter(pk=OuterRef("menuitem_id"))
+                stale_items_count = cart_items.exclude(
+                    price_version=F("menuitem__price_version")
+                ).update(
+                    price_version=Subquery(
+                        current_menuitem.values("price_version")[:1]
+                    ),
+                    unit_price=Subquery(current_menuitem.values("price")[:1]),
+                )
+                if stale_items_count:
+                    return Response(
+                        {
+                            "message": (
+                                "Menu prices have changed, cart updated with new "
+                                "prices"
+                            )
+                        },
+                        status=status.HTTP_409_CONFLICT,
+                    )
+
+                # Create new order and transfer the revalidated cart items.
+                cart_lines = list(cart_items)
+                order_total = 0
+                for cart_item in cart_lines:
+                    order_total += cart_item.quantity * cart_item.unit_price
+                new_order = Order(
+                    user=user,
+                    total=order_total,
+                )
+                # Write order and all order items to db, and delete cart items in
+                # one hit.
+                order_items = []
+                for cart_item in cart_lines:
+                    order_items.append(
+                        OrderItem(
+                            order=new_order,
+                            menuitem=cart_item.menuitem,
+                            quantity=cart_item.quantity,
+                            unit_price=cart_item.unit_price,
+                            price=cart_item.quantity * cart_item.unit_price,
+                        )
+                    )
+                reserve_stock(
+                    {
+                        cart_item.menuitem_id: cart_item.quantity
+                        for cart_item in cart_lines
+                    }
                 )
+                new_order.save()
+                OrderItem.objects.bulk_create(order_items)
+                Cart.objects.filter(
+                    pk__in=[cart_item.pk for cart_item in cart_lines]
+                ).delete()
+                pagination.invalidate_counts(OrderItem, Cart)
+                # Post-checkout work and webhooks run in the background once
+                # committed.
+                jobs.enqueue(
+                    "order.created",
+                    {"order_id": new_order.pk, "ordered": timezone.now().isoformat()},
+                )
+                webhooks.record_order_events("order.created", [new_order])
+        except OutOfStock:
+            return Response(
+                {"message": "Some items in the cart are sold out"},
+                status=status.HTTP_409_CONFLICT,
             )
-        new_order.save()
-        OrderItem.objects.bulk_create(order_items)
-        cart_items.delete()
         return Response(
             {"message": "Order created and cart is empty"},
             status=status.HTTP_201_CREATED,
@@ -327,11 +635,20 @@ class SingleOrderView(
     permission_classes = [IsAuthenticated]
     throttle_classes = [UserRateThrottle]
 
+    def get_serializer_class(self):
+        if self.request.method == "GET" and is_archive_request(self.request):
+            return ArchivedOrderItemSerializer
+        return OrderItemSerializer
+
     def get_queryset(self):
         # Query OrderItems of Order on GET requests.
         if self.request.method == "GET":
+            if is_archive_request(self.request):
+                order_model, item_model = ArchivedOrder, ArchivedOrderItem
+            else:
+                order_model, item_model = Order, OrderItem
             # Ensure specified order exists.
-            order = get_object_or_404(Order, pk=self.kwargs.get("pk"))
+            order = get_object_or_404(order_model, pk=self.kwargs.get("pk"))
             # Ensure user is owner or a manager or in the delivery crew.
             if (
                 self.request.user != order.user
@@ -341,7 +658,9 @@ class SingleOrderView(
                 raise Http404
 
             # List all items of specified order.
-            return OrderItem.objects.filter(order=order)
+            return item_model.objects.filter(order=order).select_related(
+                "order", "menuitem__category"
+            )
 
         # Query Order on PUT, PATCH, and DELETE.
         elif self.request.method in ["PUT", "PATCH", "DELETE"]:
@@ -383,7 +702,7 @@ class SingleOrderView(
         order.status = post_data_status
         order.total = post_data_total
         order.date = post_data_date
-        order.save()
+        save_order(order)
         return Response({"message": "Order updated"}, status=status.HTTP_200_OK)
 
     def patch(self, request, *args, **kwargs):
@@ -419,7 +738,7 @@ class SingleOrderView(
                 order.total = post_data_total
             if post_data_date:
                 order.date = post_data_date
-            order.save()
+            save_order(order)
             return Response({"message": "Order updated"}, status=status.HTTP_200_OK)
 
         elif is_delivery_crew(self.request.user):
@@ -444,7 +763,7 @@ class SingleOrderView(
             if post_data_status:
                 # Update status of specified order and write to db.
                 order.status = post_data_status
-                order.save()
+                save_order(order)
                 return Response(
                     {"message": "Order status updated"}, status=status.HTTP_200_OK
                 )
@@ -464,4 +783,322 @@ class SingleOrderView(
             )
         order = self.get_queryset()
         order.delete()
+        pagination.invalidate_counts(Order, OrderItem)
         return Response({"message": "Order deleted"}, status=status.HTTP_200_OK)
+
+
+class BulkOrderUpdateView(generics.GenericAPIView):
+    """
+    Update the status and delivery crew of many orders at once.
+
+    Accepts a list of {order_id, status, delivery_crew} updates, as is or in an
+    "updates" field, and returns a result for each update. Valid updates are
+    applied in one transaction even if others fail.
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [UserRateThrottle]
+    max_updates = 100
+
+    def post(self, request, *args, **kwargs):
+        # Only allow request from managers and delivery crew.
+        user = self.request.user
+        user_is_manager = is_manager(user)
+        if not user_is_manager and not is_delivery_crew(user):
+            return Response(
+                {"message": "You are not authorized"}, status.HTTP_403_FORBIDDEN
+            )
+
+        updates = request.data
+        if isinstance(updates, dict):
+            updates = updates.get("updates")
+        if not isinstance(updates, list) or not 0 < len(updates) <= self.max_updates:
+            return Response(
+                {"message": f"Expected a list of 1 to {self.max_updates} updates"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Validate all updates, then query orders and delivery crew once for all.
+        serializers = [OrderBulkUpdateSerializer(data=update) for update in updates]
+        valid_updates = [
+            serializer.validated_data
+            for serializer in serializers
+            if serializer.is_valid()
+        ]
+        orders = Order.objects.in_bulk([update["order_id"] for update in valid_updates])
+        delivery_crew_ids = set(
+            User.objects.filter(
+                pk__in=[
+                    update["delivery_crew"]
+                    for update in valid_updates
+                    if update.get("delivery_crew") is not None
+                ],
+                groups__name="Delivery crew",
+            ).values_list("pk", flat=True)
+        )
+
+        results = []
+        updated_orders = {}
+        for serializer in serializers:
+            if not serializer.is_valid():
+                results.append(
+                    {"status": status.HTTP_400_BAD_REQUEST, "errors": serializer.errors}
+                )
+                continue
+            update = serializer.validated_data
+            order = orders.get(update["order_id"])
+            error = self.validate_update(
+                update, order, updated_orders, delivery_crew_ids, user_is_manager
+            )
+            if error:
+                code, message = error
+            else:
+                code, message = status.HTTP_200_OK, "Order updated"
+                order.delivery_crew_id = update.get(
+                    "delivery_crew", order.delivery_crew_id
+                )
+                order.status = update.get("status", order.status)
+                updated_orders[order.pk] = order
+            results.append(
+                {"order_id": update["order_id"], "status": code, "message": message}
+            )
+
+        # Write all updated orders and their outbox jobs and events at once.
+        updated_orders = list(updated_orders.values())
+        with transaction.atomic():
+            Order.objects.bulk_update(updated_orders, ["status", "delivery_crew"])
+            pagination.invalidate_counts(Order)
+            jobs.enqueue_many(
+                "order.updated", [{"order_id": order.pk} for order in updated_orders]
+            )
+            webhooks.record_order_events("order.updated", updated_orders)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    def validate_update(
+        self, update, order, updated_orders, delivery_crew_ids, user_is_manager
+    ):
+        """Return the status code and message of an invalid update, or None."""
+        if order is None:
+            return status.HTTP_404_NOT_FOUND, "Order not found"
+        if order.pk in updated_orders:
+            return status.HTTP_400_BAD_REQUEST, "Order updated more than once"
+
+        if not user_is_manager:
+            # Delivery crew can ONLY update status of their assigned orders.
+            if order.delivery_crew_id != self.request.user.pk:
+                return status.HTTP_401_UNAUTHORIZED, "Not assigned to this order"
+            if "delivery_crew" in update:
+                return (
+                    status.HTTP_401_UNAUTHORIZED,
+                    "Delivery crew can only update status",
+                )
+
+        delivery_crew_id = update.get("delivery_crew", order.delivery_crew_id)
+        if "delivery_crew" in update and (
+            delivery_crew_id is not None and delivery_crew_id not in delivery_crew_ids
+        ):
+            return status.HTTP_400_BAD_REQUEST, "Invalid delivery crew assignment"
+        # Can't set order as delivered without a delivery crew assigned.
+        if update.get("status", order.status) and delivery_crew_id is None:
+            return (
+                status.HTTP_400_BAD_REQUEST,
+                "Invalid status assignment due to no delivery crew",
+            )
+        return None
+
+
+class BatchView(generics.GenericAPIView):
+    """
+    Run many requests to the API in one round trip.
+
+    Requests are authenticated once, run in-process in order, and their
+    responses returned together. A failing request gets a 500 response of its
+    own, and its writes are rolled back. Batches of only GET requests can be run
+    concurrently with "parallel": true.
+    """
+
+    permission_classes = [AllowAny]
+    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    max_concurrency = 4
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sub_requests = serializer.validated_data["requests"]
+
+        responses = [None] * len(sub_requests)
+        built = {}
+        for index, sub_request in enumerate(sub_requests):
+            try:
+                built[index] = batch.build_request(
+                    request,
+                    sub_request["method"],
+                    sub_request["path"],
+                    sub_request.get("body"),
+                )
+            except Http404 as error:
+                responses[index] = {
+                    "status": status.HTTP_404_NOT_FOUND,
+                    "body": {"detail": str(error)},
+                }
+
+        concurrency = 0
+        if serializer.validated_data["parallel"] and all(
+            sub_request["method"] == "GET" for sub_request in sub_requests
+        ):
+            concurrency = min(self.max_concurrency, len(built))
+        for index, response in zip(built, batch.run(list(built.values()), concurrency)):
+            responses[index] = response
+        return Response({"responses": responses}, status=status.HTTP_200_OK)
+
+
+class PrepTasksView(generics.ListAPIView):
+    """
+    List the prep tasks of the kitchen in the order to start them.
+
+    Queued and claimed tasks are listed, or tasks of one status with ?status=.
+    """
+
+    serializer_class = PrepTaskSerializer
+    permission_classes = [IsAuthenticated]
+    # Kitchen displays poll the queue, so they are not throttled.
+    throttle_classes = []
+
+    def get_queryset(self):
+        tasks = PrepTask.objects.select_related("menuitem").order_by("start_by", "pk")
+        task_status = self.request.query_params.get("status")
+        if task_status:
+            return tasks.filter(status=task_status)
+        return tasks.filter(status__in=[PrepTask.QUEUED, PrepTask.CLAIMED])
+
+    def get(self, request, *args, **kwargs):
+        # Only allow request from managers.
+        if not is_manager(self.request.user):
+            return Response(
+                {"message": "You are not authorized"}, status.HTTP_403_FORBIDDEN
+            )
+        return super().get(request, *args, **kwargs)
+
+
+class ClaimPrepTaskView(generics.GenericAPIView):
+    """
+    Claim the prep task to start next for a kitchen station.
+
+    Returns the claimed task, or no content if no task is queued.
+    """
+
+    serializer_class = PrepTaskClaimSerializer
+    permission_classes = [IsAuthenticated]
+    throttle_classes = []
+
+    def post(self, request, *args, **kwargs):
+        # Only allow request from managers.
+        if not is_manager(self.request.user):
+            return Response(
+                {"message": "You are not authorized"}, status.HTTP_403_FORBIDDEN
+            )
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        task_id = kitchen.queue.claim(serializer.validated_data["station"])
+        if task_id is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        task = PrepTask.objects.select_related("menuitem").get(pk=task_id)
+        return Response(PrepTaskSerializer(task).data, status=status.HTTP_200_OK)
+
+
+class CompletePrepTaskView(generics.GenericAPIView):
+    """Mark a prep task claimed by a kitchen station as done."""
+
+    serializer_class = PrepTaskClaimSerializer
+    permission_classes = [IsAuthenticated]
+    throttle_classes = []
+
+    def post(self, request, *args, **kwargs):
+        # Only allow request from managers.
+        if not is_manager(self.request.user):
+            return Response(
+                {"message": "You are not authorized"}, status.HTTP_403_FORBIDDEN
+            )
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        task = get_object_or_404(
+            PrepTask.objects.select_related("menuitem"), pk=self.kwargs.get("pk")
+        )
+        if not kitchen.complete(task.pk, serializer.validated_data["station"]):
+            return Response(
+                {"message": "Task is not claimed by this station"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        task.refresh_from_db(fields=["status", "completed"])
+        return Response(PrepTaskSerializer(task).data, status=status.HTTP_200_OK)
+
+
+class MetricsView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, PrometheusRenderer]
+
+    def get(self, request, *args, **kwargs):
+        # Only allow request from managers.
+        if not is_manager(self.request.user):
+            return Response(
+                {"message": "You are not authorized"}, status.HTTP_403_FORBIDDEN
+            )
+        return Response(metrics.snapshot(), status=status.HTTP_200_OK)
+
+
+class ProfilesView(generics.GenericAPIView):
+    """List the most recent request profiles, see LittleLemonAPI.profiling."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        # Only allow request from managers.
+        if not is_manager(self.request.user):
+            return Response(
+                {"message": "You are not authorized"}, status.HTTP_403_FORBIDDEN
+            )
+        return Response(
+            [profile.summary() for profile in profiling.get_profiles()],
+            status=status.HTTP_200_OK,
+        )
+
+
+class SingleProfileView(generics.GenericAPIView):
+    """
+    Show a request profile with its queries and slowest functions.
+
+    With ?download=true, return the profile as a pstats file instead.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        # Only allow request from managers.
+        if not is_manager(self.request.user):
+            return Response(
+                {"message": "You are not authorized"}, status.HTTP_403_FORBIDDEN
+            )
+        profile = profiling.get_profile(str(self.kwargs.get("pk")))
+        if profile is None:
+            raise Http404
+
+        if request.query_params.get("download", "").lower() in ("true", "1"):
+            return HttpResponse(
+                profile.dump(),
+                content_type="application/octet-stream",
+                headers={
+                    "Content-Disposition": (
+                        f'attachment; filename="profile-{profile.id}.prof"'
+                    )
+                },
+            )
+        return Response(
+            {
+                **profile.summary(),
+                "sql": profile.queries,
+                "stats": profile.report(),
+            },
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,84 @@
+import time
+
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.settings import api_settings
+
+# Classes DRF imports lazily on the first request of every worker.
+API_SETTINGS = (
+    "DEFAULT_RENDERER_CLASSES",
+    "DEFAULT_PARSER_CLASSES",
+    "DEFAULT_AUTHENTICATION_CLASSES",
+    "DEFAULT_PERMISSION_CLASSES",
+    "DEFAULT_THROTTLE_CLASSES",
+    "DEFAULT_FILTER_BACKENDS",
+    "DEFAULT_PAGINATION_CLASS",
+)
+
+
+def get_view_classes(patterns=None):
+    """Return the class based views of all URL patterns, included ones too."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    view_classes = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            view_classes.extend(get_view_classes(pattern.url_patterns))
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, "cls", None) or getattr(
+                pattern.callback, "view_class", None
+            )
+            if view_class is not None and view_class not in view_classes:
+                view_classes.append(view_class)
+    return view_classes
+
+
+def warm_up_urls():
+    resolver = get_resolver()
+    # Compiles all patterns and builds the lookups used by reverse().
+    resolver.reverse_dict
+    return len(get_view_classes())
+
+
+def warm_up_api_settings():
+    for name in API_SETTINGS:
+        getattr(api_settings, name)
+    return len(API_SETTINGS)
+
+
+def warm_up_serializers():
+    """Build the fields of all serializers, imported lazily by model serializers."""
+    serializer_classes = {
+        view_class.serializer_class
+        for view_class in get_view_classes()
+        if getattr(view_class, "serializer_class", None) is not None
+    }
+    for serializer_class in serializer_classes:
+        serializer = serializer_class()
+        serializer.fields
+        child = getattr(serializer, "child", None)
+        if child is not None:
+            child.fields
+    return len(serializer_classes)
+
+
+STEPS = {
+    "urls": warm_up_urls,
+    "api_settings": warm_up_api_settings,
+    "serializers": warm_up_serializers,
+}
+
+
+def warm_up():
+    """
+    Do the work of the first requests of a worker before it accepts traffic.
+
+    Returns the number of items warmed up by every step and its duration in
+    milliseconds. Nothing is read from the database, so workers forked
+    afterwards share no connections or stale data.
+    """
+    timings = {}
+    for name, step in STEPS.items():
+        start = time.perf_counter()
+        count = step()
+        timings[name] = (count, (time.perf_counter() - start) * 1000)
+    return timings
@@ -0,0 +1,217 @@
+import hashlib
+import hmac
+import http.client
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import Order, OrderEvent, WebhookSubscriber
+
+
+def order_payload(order: Order):
+    """Return the JSON serializable fields of an order."""
+    # Views assign request data to orders, so convert fields to their types.
+    field = Order._meta.get_field
+    return {
+        "id": order.pk,
+        "user_id": order.user_id,
+        "delivery_crew_id": order.delivery_crew_id,
+        "status": field("status").to_python(order.status),
+        "total": str(field("total").to_python(order.total)),
+        "date": str(field("date").to_python(order.date)),
+    }
+
+
+def record_order_events(event: str, orders):
+    """
+    Write events for orders to the outbox.
+
+    Must be called in the transaction writing the orders, so events are recorded
+    if and only if the orders are.
+    """
+    OrderEvent.objects.bulk_create(
+        [
+            OrderEvent(event=event, order_id=order.pk, payload=order_payload(order))
+            for order in orders
+        ]
+    )
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of persistent HTTP connections per host.
+
+    At most max_connections requests are made to a host at once, and idle
+    connections are kept open for reuse.
+    """
+
+    def __init__(self, max_connections: int = 4, timeout: float = 10):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, scheme: str, netloc: str):
+        with self._lock:
+            if (scheme, netloc) not in self._hosts:
+                self._hosts[scheme, netloc] = (
+                    threading.BoundedSemaphore(self.max_connections),
+                    queue.LifoQueue(),
+                )
+            return self._hosts[scheme, netloc]
+
+    def request(self, method: str, url: str, body: bytes, headers: dict):
+        """Make a request and return the response status and body."""
+        parts = urlsplit(url)
+        semaphore, idle = self._host(parts.scheme, parts.netloc)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        with semaphore:
+            try:
+                connection = idle.get_nowait()
+            except queue.Empty:
+                connection_class = (
+                    http.client.HTTPSConnection
+                    if parts.scheme == "https"
+                    else http.client.HTTPConnection
+                )
+                connection = connection_class(parts.netloc, timeout=self.timeout)
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                content = response.read()
+            except Exception:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                idle.put(connection)
+            return response.status, content
+
+    def close(self):
+        with self._lock:
+            for _, idle in self._hosts.values():
+                while not idle.empty():
+                    idle.get_nowait().close()
+            self._hosts.clear()
+
+
+def retry_delay(failures: int):
+    """Return the exponential backoff delay after consecutive failures."""
+    return timedelta(seconds=min(2**failures, 3600))
+
+
+def post_events(pool: ConnectionPool, subscriber: WebhookSubscriber, events):
+    """
+    POST a batch of events to a subscriber.
+
+    Returns the number of events posted, skipping events the subscriber is not
+    interested in, or None on failure.
+    """
+    events = [
+        {
+            "id": event.pk,
+            "event": event.event,
+            "created": event.created,
+            "order": event.payload,
+        }
+        for event in events
+        if not subscriber.events or event.event in subscriber.events
+    ]
+    if not events:
+        # Nothing the subscriber is interested in.
+        return 0
+
+    body = json.dumps({"events": events}, cls=DjangoJSONEncoder).encode()
+    headers = {"Content-Type": "application/json"}
+    if subscriber.secret:
+        signature = hmac.new(subscriber.secret.encode(), body, hashlib.sha256)
+        headers["X-LittleLemon-Signature"] = f"sha256={signature.hexdigest()}"
+    try:
+        status, _ = pool.request("POST", subscriber.url, body, headers)
+    except (OSError, http.client.HTTPException):
+        return None
+    if not 200 <= status < 300:
+        return None
+    return len(events)
+
+
+def deliver(pool: ConnectionPool, batch_size: int = 100, concurrency: int = 4):
+    """
+    Deliver the next batch of pending events to every due subscriber.
+
+    Batches are posted concurrently, while all database access stays on the
+    calling thread. Subscribers advance past a batch only once it is accepted,
+    and are retried with backoff on failure, so events are delivered at least
+    once and in order. Returns the number of events delivered.
+
+    Transactions may commit out of id order, so only events older than
+    settings.WEBHOOK_SETTLE_SECONDS are delivered. Otherwise subscribers could
+    advance past events of transactions still to commit, and never receive them.
+    """
+    now = timezone.now()
+    settled = now - timedelta(seconds=getattr(settings, "WEBHOOK_SETTLE_SECONDS", 5))
+    subscribers = WebhookSubscriber.objects.filter(active=True).filter(
+        Q(retry_after__isnull=True) | Q(retry_after__lte=now)
+    )
+    batches = []
+    for subscriber in subscribers:
+        events = list(
+            OrderEvent.objects.filter(
+                pk__gt=subscriber.last_event_id, created__lte=settled
+            ).order_by("pk")[:batch_size]
+        )
+        if events:
+            batches.append((subscriber, events))
+    if not batches:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(
+            executor.map(
+                lambda batch: post_events(pool, *batch),
+                batches,
+            )
+        )
+
+    delivered_count = 0
+    for (subscriber, events), posted_count in zip(batches, results):
+        if posted_count is not None:
+            subscriber.last_event_id = events[-1].pk
+            subscriber.failures = 0
+            subscriber.retry_after = None
+            delivered_count += posted_count
+        else:
+            subscriber.failures += 1
+            subscriber.retry_after = now + retry_delay(subscriber.failures)
+    WebhookSubscriber.objects.bulk_update(
+        [subscriber for subscriber, _ in batches],
+        ["last_event_id", "failures", "retry_after"],
+    )
+    return delivered_count
+
+
+def prune():
+    """
+    Delete events delivered to all subscribers.
+
+    Inactive subscribers keep their events until removed, and events are kept
+    while there are no subscribers.
+    """
+    delivered_id = WebhookSubscriber.objects.aggregate(Min("last_event_id"))[
+        "last_event_id__min"
+    ]
+    if delivered_id is None:
+        return 0
+    return OrderEvent.objects.filter(pk__lte=delivered_id).delete()[0]